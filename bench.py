@@ -0,0 +1,551 @@
+"""Offline benchmark for the aggregate page
+
+Starts a local stub upstream serving synthetic RSS/Atom feeds, Reddit JSON
+listings, YouTube channel feeds and Twitch GraphQL responses, points the
+fetchers at it through a rewriting transport adapter, and measures:
+
+- cold page latency (empty caches, every source fetched)
+- per-phase timings (config, fetch, render) for cold and revalidating builds
+- warm page latency and throughput under concurrent clients
+- peak Python heap (tracemalloc) and process RSS
+
+Usage:
+    python bench.py [--feeds 40] [--items 25] [--latency 0.05] [--error-rate 0]
+                    [--no-etag] [--iterations 10] [--clients 8] [--duration 5]
+                    [--json results.json]
+
+Nothing leaves the machine: synthetic feed URLs use the reserved .test TLD
+and every request, including Reddit, YouTube and Twitch, is answered by the
+stub server.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Defaults that make every build hit the stub instead of serving fresh cache
+# entries; exported before main is imported since it reads them at import time
+BENCH_ENV = {
+    'REFRESH_INTERVAL': '0',
+    'CACHE_DB_PATH': '',
+    'ITEM_DB_PATH': os.path.join(tempfile.gettempdir(), 'prawnfeeds-bench-items.sqlite3'),
+    'POLL_MIN_INTERVAL': '0',
+    'POLL_MAX_INTERVAL': '0',
+    'TWITCH_TTL': '0',
+    'BUILD_DIR': '',
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(values):
+    """p50/p95/p99/mean/max of a list of seconds, in milliseconds"""
+    if not values:
+        return {}
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'mean_ms': round(statistics.mean(values) * 1000, 2),
+        'max_ms': round(max(values) * 1000, 2)
+    }
+
+
+class StubUpstream:
+    """Threaded HTTP server standing in for every upstream host
+
+    Requests arrive as /<original host>/<original path>. Bodies are
+    deterministic for the lifetime of the server, so with ETags enabled a
+    conditional request for an unchanged document gets a 304.
+
+    Args:
+        items: Entries per feed document
+        item_bytes: Size of each entry's description padding
+        latency: Seconds to wait before answering each request
+        error_rate: Fraction of requests answered with a 503
+        etag: Whether to send ETags and honour If-None-Match
+        seed: Seed for the error-injection RNG
+    """
+
+    def __init__(self, items=25, item_bytes=200, latency=0.0, error_rate=0.0, etag=True, seed=0):
+        self.items = items
+        self.item_bytes = item_bytes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.etag = etag
+        self.base_ts = int(time.time())
+        self._random = random.Random(seed)
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'not_modified': 0, 'errors': 0, 'bytes': 0}
+        self.server = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.handle(self, None)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                stub.handle(self, json.loads(self.rfile.read(length) or b'{}'))
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            # The default backlog of 5 drops connections from a full fetch fan-out
+            request_queue_size = 128
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, name='bench-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot_counts(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def handle(self, handler, payload):
+        self._count('requests')
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            self._count('errors')
+            self._send(handler, 503, b'upstream unavailable', 'text/plain')
+            return
+
+        host, _, rest = handler.path.lstrip('/').partition('/')
+        parsed = urlparse('/' + rest)
+        if host == 'gql.twitch.tv':
+            body, content_type = self.twitch(payload or {}), 'application/json'
+        elif host == 'www.reddit.com' and parsed.path.endswith('/top.json'):
+            subreddits = parsed.path.split('/')[2].split('+')
+            limit = int(parse_qs(parsed.query).get('limit', ['25'])[0])
+            body, content_type = self.cached_body(handler.path, lambda: self.reddit(subreddits, limit)), 'application/json'
+        elif host == 'www.youtube.com':
+            body, content_type = self.cached_body(handler.path, lambda: self.atom(host, youtube=True)), 'application/atom+xml'
+        elif int(hashlib.md5(host.encode()).hexdigest(), 16) % 2:
+            body, content_type = self.cached_body(handler.path, lambda: self.atom(host)), 'application/atom+xml'
+        else:
+            body, content_type = self.cached_body(handler.path, lambda: self.rss(host)), 'application/rss+xml'
+
+        etag = f'"{hashlib.md5(body).hexdigest()}"' if self.etag else None
+        if etag and handler.headers.get('If-None-Match') == etag:
+            self._count('not_modified')
+            self._send(handler, 304, b'', None, etag)
+            return
+        self._send(handler, 200, body, content_type, etag)
+
+    def _send(self, handler, status, body, content_type, etag=None):
+        handler.send_response(status)
+        if content_type:
+            handler.send_header('Content-Type', content_type)
+        if etag:
+            handler.send_header('ETag', etag)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+        self._count('bytes', len(body))
+
+    def cached_body(self, key, build):
+        with self._lock:
+            body = self._bodies.get(key)
+        if body is None:
+            body = build()
+            with self._lock:
+                self._bodies[key] = body
+        return body
+
+    def _padding(self, idx):
+        return ('lorem ipsum dolor sit amet ' * (self.item_bytes // 27 + 1))[:self.item_bytes] + str(idx)
+
+    def rss(self, host):
+        from email.utils import formatdate
+        entries = ''.join(
+            f'<item><title>{host} post {i}</title>'
+            f'<link>https://{host}/posts/{i}</link><guid>https://{host}/posts/{i}</guid>'
+            f'<pubDate>{formatdate(self.base_ts - i * 3600, usegmt=True)}</pubDate>'
+            f'<media:thumbnail url="https://{host}/img/{i}.jpg"/>'
+            f'<description>{self._padding(i)}</description></item>'
+            for i in range(self.items))
+        return (f'<?xml version="1.0"?><rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">'
+                f'<channel><title>{host}</title><link>https://{host}/</link>{entries}</channel></rss>').encode()
+
+    def atom(self, host, youtube=False):
+        def published(i):
+            return time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(self.base_ts - i * 3600))
+
+        if youtube:
+            entries = ''.join(
+                f'<entry><id>yt:video:bench{i:06d}</id><title>Video {i}</title>'
+                f'<link rel="alternate" href="https://www.youtube.com/watch?v=bench{i:06d}"/>'
+                f'<published>{published(i)}</published></entry>'
+                for i in range(self.items))
+        else:
+            entries = ''.join(
+                f'<entry><id>https://{host}/entries/{i}</id><title>{host} entry {i}</title>'
+                f'<link rel="alternate" href="https://{host}/entries/{i}"/>'
+                f'<updated>{published(i)}</updated><summary>{self._padding(i)}</summary></entry>'
+                for i in range(self.items))
+        return (f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">'
+                f'<title>{host}</title><link href="https://{host}/"/>{entries}</feed>').encode()
+
+    def reddit(self, subreddits, limit):
+        children = []
+        for subreddit in subreddits:
+            for i in range(min(limit // max(len(subreddits), 1), self.items)):
+                children.append({'data': {
+                    'title': f'{subreddit} post {i}', 'subreddit': subreddit,
+                    'permalink': f'/r/{subreddit}/comments/bench{i}/', 'name': f't3_{subreddit}{i}',
+                    'score': 1000 - i, 'num_comments': i, 'thumbnail': 'self',
+                    'created_utc': self.base_ts - i * 600
+                }})
+        return json.dumps({'data': {'children': children}}).encode()
+
+    def twitch(self, payload):
+        variables = payload.get('variables', {})
+        data = {}
+        for name, login in variables.items():
+            alias = 'user' if name == 'login' else 'u' + name[1:]
+            live = int(hashlib.md5(login.encode()).hexdigest(), 16) % 3 == 0
+            data[alias] = {
+                'login': login, 'displayName': login.title(),
+                'stream': {'title': f'{login} live', 'viewersCount': 100,
+                           'game': {'name': 'Bench'}} if live else None
+            }
+        return json.dumps({'data': data}).encode()
+
+
+def synthetic_config(feeds, sections, subreddits, youtube, twitch):
+    """feeds.json contents pointing at one synthetic .test host per feed"""
+    per_section = max(feeds // sections, 1)
+    return {
+        'sections': [
+            {'title': f'Section {s}', 'feeds': [
+                {'name': f'Feed {i}', 'url': f'https://feed{i}-bench.test/feed.xml', 'limit': 3}
+                for i in range(s * per_section, min((s + 1) * per_section, feeds))
+            ]}
+            for s in range(sections)
+        ],
+        'subreddits': [f'benchsub{i}' for i in range(subreddits)],
+        'youtube_channels': [
+            {'name': f'Channel {i}', 'channel_id': f'UCbench{i:017d}', 'category': 'Bench', 'limit': 3}
+            for i in range(youtube)
+        ],
+        'twitch_channels': [f'benchstreamer{i}' for i in range(twitch)]
+    }
+
+
+def point_fetchers_at(main, stub):
+    """Route every request from main's shared session to the stub server"""
+    from requests.adapters import HTTPAdapter
+
+    class StubAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            parsed = urlparse(request.url)
+            request.url = f'{stub.base_url}/{parsed.netloc}{parsed.path}' + (
+                f'?{parsed.query}' if parsed.query else '')
+            return super().send(request, **kwargs)
+
+    session = main.get_http_session()
+    adapter = main.instrument_adapter(
+        StubAdapter(pool_connections=1, pool_maxsize=main.FETCH_MAX_WORKERS))
+    session.adapters.clear()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+
+def reset_state(main):
+    """Drop every cache and learned state so the next build starts cold"""
+    main.FEED_CACHE = main.create_feed_cache()
+    main.FRAGMENT_CACHE = main.LRUCache(main.FRAGMENT_CACHE_MAX_ENTRIES, main.FRAGMENT_CACHE_MAX_BYTES)
+    main.FEED_BREAKERS = main.CircuitBreakers(
+        main.BREAKER_FAILURE_THRESHOLD, main.BREAKER_SLOW_SECONDS,
+        main.BREAKER_BASE_COOLDOWN, main.BREAKER_MAX_COOLDOWN)
+    main.FEED_POLLER = main.PollScheduler(
+        main.POLL_MIN_INTERVAL, main.POLL_MAX_INTERVAL, main.POLL_CADENCE_FRACTION)
+    main.REDDIT_BACKOFF = main.RetryAfterBackoff(main.REDDIT_BACKOFF_BASE, main.REDDIT_BACKOFF_MAX)
+    main.SNAPSHOT = None
+    reset_politeness(main)
+
+
+def reset_politeness(main):
+    """Forget per-site request spacing, as builds here run back to back
+    rather than REFRESH_INTERVAL apart"""
+    main.HOST_LIMITER = main.HostRateLimiter(main.HOST_MIN_INTERVAL)
+
+
+def timed_build(main):
+    """Run one snapshot build and render, returning (snapshot, phase timings)"""
+    started = time.perf_counter()
+    main.load_feeds_config()
+    config_done = time.perf_counter()
+    snapshot = main.build_snapshot()
+    fetch_done = time.perf_counter()
+    with main.app.test_request_context('/'):
+        html = main.render_template('index.html', **main.render_context(snapshot))
+    render_done = time.perf_counter()
+    return snapshot, {
+        'config': config_done - started,
+        'fetch': fetch_done - config_done,
+        'render': render_done - fetch_done,
+        'total': render_done - started,
+        'html_bytes': len(html)
+    }
+
+
+def get_page(session, url):
+    """Fetch a page to completion and return its latency in seconds"""
+    started = time.perf_counter()
+    response = session.get(url, timeout=60)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def run_clients(url, clients, duration):
+    """Hammer url from concurrent clients, returning (latencies, requests per second)"""
+    import requests
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            try:
+                local.append(get_page(session, url))
+            except requests.RequestException as e:
+                errors.append(e)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, len(latencies) / elapsed, len(errors)
+
+
+def phase_summary(runs):
+    return {phase: summarize([run[phase] for run in runs])
+            for phase in ('config', 'fetch', 'render', 'total')}
+
+
+def main_bench(args):
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    if os.environ['ITEM_DB_PATH'] == BENCH_ENV['ITEM_DB_PATH']:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(BENCH_ENV['ITEM_DB_PATH'] + suffix)
+            except FileNotFoundError:
+                pass
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    import main
+    import requests
+    from werkzeug.serving import make_server
+
+    if not args.verbose:
+        main.logger.setLevel(logging.CRITICAL)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    config_path = os.path.join(tempfile.mkdtemp(prefix='prawnfeeds-bench-'), 'feeds.json')
+    with open(config_path, 'w') as f:
+        json.dump(synthetic_config(args.feeds, args.sections, args.subreddits,
+                                   args.youtube, args.twitch), f)
+    main.CONFIG_PATH = config_path
+
+    stub = StubUpstream(items=args.items, item_bytes=args.item_bytes, latency=args.latency,
+                        error_rate=args.error_rate, etag=not args.no_etag, seed=args.seed).start()
+    point_fetchers_at(main, stub)
+    server = make_server('127.0.0.1', 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    page_url = f'http://127.0.0.1:{server.server_port}/'
+    results = {'settings': vars(args)}
+
+    # Parse workers start with the server in production, so keep their startup out of the timings
+    main.PARSE_POOL.start(wait=True)
+
+    # Cold page: empty caches, root() fetches everything while serving
+    page_session = requests.Session()
+    cold_pages = []
+    for _ in range(args.iterations):
+        reset_state(main)
+        cold_pages.append(get_page(page_session, page_url))
+    results['cold_page'] = summarize(cold_pages)
+
+    # Phase timings for cold builds, with upstream requests per build
+    cold_runs = []
+    before = stub.snapshot_counts()
+    for _ in range(args.iterations):
+        reset_state(main)
+        cold_runs.append(timed_build(main)[1])
+    after = stub.snapshot_counts()
+    results['cold_build'] = phase_summary(cold_runs)
+    results['cold_build']['upstream_requests'] = (after['requests'] - before['requests']) / args.iterations
+    results['cold_build']['html_bytes'] = cold_runs[-1]['html_bytes']
+
+    # Revalidating builds: caches kept, every entry stale, so upstream answers 304 or unchanged
+    revalidate_runs = []
+    before = stub.snapshot_counts()
+    for _ in range(args.iterations):
+        reset_politeness(main)
+        revalidate_runs.append(timed_build(main)[1])
+    after = stub.snapshot_counts()
+    results['revalidate_build'] = phase_summary(revalidate_runs)
+    results['revalidate_build']['upstream_requests'] = (after['requests'] - before['requests']) / args.iterations
+    results['revalidate_build']['not_modified'] = (after['not_modified'] - before['not_modified']) / args.iterations
+
+    # Warm page served from the published snapshot
+    reset_politeness(main)
+    main.SNAPSHOT = main.build_snapshot()
+    warm_pages = [get_page(page_session, page_url) for _ in range(args.iterations * 5)]
+    results['warm_page'] = summarize(warm_pages)
+
+    latencies, throughput, errors = run_clients(page_url, args.clients, args.duration)
+    results['concurrent'] = dict(summarize(latencies), clients=args.clients,
+                                 requests_per_second=round(throughput, 1), errors=errors)
+
+    # Cold stampede: every client asks for the page at once with nothing cached,
+    # so all of them should share a single build
+    reset_state(main)
+    before = stub.snapshot_counts()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        stampede = list(pool.map(lambda _: get_page(requests.Session(), page_url),
+                                 range(args.clients)))
+    after = stub.snapshot_counts()
+    results['cold_stampede'] = dict(summarize(stampede), clients=args.clients,
+                                    upstream_requests=after['requests'] - before['requests'])
+    results['single_flight'] = {'snapshot': main.SNAPSHOT_FLIGHT.stats(),
+                                'fetch': main.FETCH_FLIGHT.stats()}
+
+    # Peak Python heap across one cold build and render
+    reset_state(main)
+    tracemalloc.start()
+    timed_build(main)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results['memory'] = {'peak_heap_mb': round(peak / 1024 / 1024, 2)}
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        results['memory']['max_rss_mb'] = round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+    except ImportError:
+        pass
+
+    results['stub'] = stub.snapshot_counts()
+    server.shutdown()
+    stub.stop()
+    return results
+
+
+def print_report(results):
+    settings = results['settings']
+    print(f"PrawnFeeds benchmark: {settings['feeds']} feeds x {settings['items']} items, "
+          f"{settings['subreddits']} subreddits, {settings['youtube']} YouTube, "
+          f"{settings['twitch']} Twitch, latency {settings['latency']}s, "
+          f"error rate {settings['error_rate']}, ETag {'off' if settings['no_etag'] else 'on'}")
+    print()
+    print(f"{'':28}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+
+    def row(label, summary):
+        if summary:
+            print(f"{label:28}{summary['p50_ms']:>8.1f}ms{summary['p95_ms']:>8.1f}ms"
+                  f"{summary['p99_ms']:>8.1f}ms{summary['max_ms']:>8.1f}ms")
+
+    row('cold page', results['cold_page'])
+    for name in ('cold_build', 'revalidate_build'):
+        for phase in ('config', 'fetch', 'render', 'total'):
+            row(f"{name.replace('_', ' ')}: {phase}", results[name][phase])
+    row('warm page', results['warm_page'])
+    row(f"concurrent page ({results['concurrent']['clients']} clients)", results['concurrent'])
+    row(f"cold stampede ({results['cold_stampede']['clients']} clients)", results['cold_stampede'])
+    print()
+    print(f"Upstream requests per build: cold {results['cold_build']['upstream_requests']:.1f}, "
+          f"revalidate {results['revalidate_build']['upstream_requests']:.1f} "
+          f"({results['revalidate_build']['not_modified']:.1f} not modified)")
+    print(f"Cold stampede upstream requests: {results['cold_stampede']['upstream_requests']} "
+          f"(builds shared by {results['single_flight']['snapshot']['shared']} requests, "
+          f"fetches shared {results['single_flight']['fetch']['shared']} times)")
+    print(f"Throughput: {results['concurrent']['requests_per_second']} req/s "
+          f"({results['concurrent']['errors']} errors)")
+    memory = results['memory']
+    print(f"Memory: peak heap {memory['peak_heap_mb']} MB"
+          + (f", max RSS {memory['max_rss_mb']} MB" if 'max_rss_mb' in memory else ''))
+    print(f"Page size: {results['cold_build']['html_bytes']} bytes")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--feeds', type=int, default=40, help='RSS/Atom feeds (default 40)')
+    parser.add_argument('--sections', type=int, default=2, help='Sections the feeds are split into')
+    parser.add_argument('--subreddits', type=int, default=6)
+    parser.add_argument('--youtube', type=int, default=7, help='YouTube channels')
+    parser.add_argument('--twitch', type=int, default=15, help='Twitch channels')
+    parser.add_argument('--items', type=int, default=25, help='Entries per upstream document')
+    parser.add_argument('--item-bytes', type=int, default=200, help='Description size per entry')
+    parser.add_argument('--latency', type=float, default=0.05, help='Upstream latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of upstream 503s')
+    parser.add_argument('--no-etag', action='store_true', help='Disable upstream ETags/304s')
+    parser.add_argument('--iterations', type=int, default=10, help='Runs per measurement')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds of concurrent load')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='Also write results as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Keep application logging')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = main_bench(args)
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
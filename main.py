@@ -1,753 +1,3515 @@
-from flask import Flask, render_template, jsonify
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urlparse
+from flask import Flask, render_template, jsonify, get_template_attribute, stream_template, request, send_file, g
+from markupsafe import Markup
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from urllib.parse import urljoin, urlparse
+from parsing import (init_parse_worker, parse_job, parse_reddit_listing, parse_reddit_rss_body,
+                     parse_rss_body, parse_timestamp, parse_youtube_body, proxied_thumbnail,
+                     record_phase, start_fetch_timing, stop_fetch_timing, thumb_signature,
+                     timed_parse)
+import atexit
+import functools
+import hashlib
+import hmac
+import io
 import ipaddress
 import json
+import logging
+import mimetypes
 import os
+import re
+import socket
+import sqlite3
 import sys
+import tempfile
+import threading
 import traceback
+import zlib
 
 import time
-import random
 
 app = Flask(__name__, static_folder='public', static_url_path='')
 
-# Simple in-memory cache for conditional GETs
+# Enable debug logging
+app.config['DEBUG'] = True
+
+# Parallel fetching configuration
+# Overall deadline in seconds for fetching every source in one snapshot build
+FETCH_DEADLINE = float(os.environ.get('FETCH_DEADLINE', 10))
+# Concurrency budget shared by RSS, Reddit, YouTube and Twitch fetches
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', 30))
+
+# Worker processes that parse fetched feed bodies off the fetch threads
+# (0 parses on the fetch threads themselves, the default on a single core)
+PARSE_WORKERS = int(os.environ.get(
+    'PARSE_WORKERS', min(os.cpu_count(), 8) if (os.cpu_count() or 1) > 1 else 0))
+
+# Single pool shared by every fetch so the concurrency budget holds across sources
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS,
+                                    thread_name_prefix='fetch')
+
+# Path to the feeds configuration file
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feeds.json')
+
+# Output of `python main.py build`; its snapshot.json is served by a process
+# that has no snapshot of its own yet, while a fresh one is fetched
+# (an empty string disables adopting it)
+BUILD_DIR = os.environ.get(
+    'BUILD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build'))
+
+# Feed fetching configuration
+MAX_FETCH_ITEMS = 25  # Maximum items to fetch per feed for load-more support
+MAX_FEED_BYTES = int(os.environ.get('MAX_FEED_BYTES', 5 * 1024 * 1024))  # Download cap per feed
+FEED_CHUNK_SIZE = 16 * 1024  # Bytes read per chunk when streaming feed bodies
+# Minimum spacing in seconds between requests to the same site
+HOST_MIN_INTERVAL = float(os.environ.get('HOST_MIN_INTERVAL', 0.5))
+
+# Feed cache configuration
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 500))  # In-memory tier entry limit
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 32 * 1024 * 1024))  # In-memory tier size limit
+CACHE_DISK_MAX_ENTRIES = int(os.environ.get('CACHE_DISK_MAX_ENTRIES', 5000))  # On-disk tier entry limit
+# SQLite file backing the on-disk tier; set to an empty string to disable it
+CACHE_DB_PATH = os.environ.get(
+    'CACHE_DB_PATH', os.path.join(tempfile.gettempdir(), 'prawnfeeds-cache.sqlite3'))
+
+# SQLite file holding every fetched item for search and the timeline;
+# set to an empty string to disable the item store
+ITEM_DB_PATH = os.environ.get(
+    'ITEM_DB_PATH', os.path.join(tempfile.gettempdir(), 'prawnfeeds-items.sqlite3'))
+ITEM_QUERY_MAX_LIMIT = 50  # Most items returned per search or timeline page
+
+# Thumbnail proxy: images are fetched, cropped to THUMB_SIZE (twice the
+# 120x68 CSS box for high-DPI screens) and kept in a size-bounded directory;
+# set THUMB_CACHE_DIR to an empty string to resize on every request. Whether
+# thumbnails are proxied, and the key signing /thumb URLs, are set in parsing.py
+THUMB_SIZE = (240, 136)
+THUMB_QUALITY = int(os.environ.get('THUMB_QUALITY', 75))  # WebP/JPEG quality
+THUMB_MAX_SOURCE_BYTES = int(os.environ.get('THUMB_MAX_SOURCE_BYTES', 10 * 1024 * 1024))
+# Largest image decoded, in pixels after any JPEG draft downscaling
+THUMB_MAX_SOURCE_PIXELS = int(os.environ.get('THUMB_MAX_SOURCE_PIXELS', 16 * 1024 * 1024))
+THUMB_CACHE_DIR = os.environ.get(
+    'THUMB_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'prawnfeeds-thumbs'))
+THUMB_CACHE_MAX_BYTES = int(os.environ.get('THUMB_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+THUMB_MAX_AGE = 30 * 24 * 3600  # Browser cache lifetime for a thumbnail
+THUMB_MAX_REDIRECTS = 3
+
+# Rendered widget fragment cache configuration
+FRAGMENT_CACHE_MAX_ENTRIES = 1000  # Enough for several snapshots' worth of widgets
+FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# Rendered pages and compressed bodies by URL and strong ETag
+RESPONSE_CACHE_MAX_ENTRIES = 64
+RESPONSE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# HTTP freshness configuration
+HTTP_CACHE_MAX_TTL = 6 * 3600  # Upper bound on upstream-advertised freshness in seconds
+# Minimum freshness per source in seconds, used when upstream sends no cache headers
+SOURCE_MIN_TTL = {
+    'rss': int(os.environ.get('RSS_MIN_TTL', 0)),
+    'reddit': int(os.environ.get('REDDIT_MIN_TTL', 0)),
+    'youtube': int(os.environ.get('YOUTUBE_MIN_TTL', 0)),
+}
+# Twitch live status ignores response headers and is always cached for this long
+TWITCH_TTL = int(os.environ.get('TWITCH_TTL', 60))
+# Channels looked up per batched Twitch GraphQL request
+TWITCH_BATCH_SIZE = int(os.environ.get('TWITCH_BATCH_SIZE', 35))
+
+# HTTP connection pooling configuration
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 4))  # Keep-alive connections per host
+HTTP_POOL_HOSTS = 64  # Number of per-host pools kept before the least recently used is dropped
+# Larger pools for hosts that receive many concurrent requests per refresh
+HOST_POOL_SIZES = {
+    'https://www.youtube.com/': 10,
+    'https://www.reddit.com/': 6,
+}
+
+# Per-feed circuit breaker configuration
+# Consecutive failed (or slow) fetches after which a feed is skipped
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 3))
+# Fetches taking longer than this many seconds count as failures
+BREAKER_SLOW_SECONDS = float(os.environ.get('BREAKER_SLOW_SECONDS', 8))
+# Cooldown after the first trip, doubling on each failed probe up to the max
+BREAKER_BASE_COOLDOWN = int(os.environ.get('BREAKER_BASE_COOLDOWN', 60))
+BREAKER_MAX_COOLDOWN = int(os.environ.get('BREAKER_MAX_COOLDOWN', 3600))
+
+# Adaptive polling configuration for RSS and YouTube feeds
+# Bounds in seconds on how long a feed goes without being polled
+POLL_MIN_INTERVAL = int(os.environ.get('POLL_MIN_INTERVAL', 300))
+POLL_MAX_INTERVAL = int(os.environ.get('POLL_MAX_INTERVAL', 6 * 3600))
+# Fraction of a feed's typical gap between posts to wait between polls
+POLL_CADENCE_FRACTION = float(os.environ.get('POLL_CADENCE_FRACTION', 0.1))
+POLL_HISTORY = 10  # Most recent publish times used to estimate the cadence
+
+# Reddit configuration
+# Posts requested from the combined multi-subreddit listing (Reddit caps this at 100)
+REDDIT_LISTING_LIMIT = 100
+# Backoff after a Reddit 429/5xx without Retry-After, doubling per failure up to the max
+REDDIT_BACKOFF_BASE = int(os.environ.get('REDDIT_BACKOFF_BASE', 30))
+REDDIT_BACKOFF_MAX = int(os.environ.get('REDDIT_BACKOFF_MAX', 900))
+
+# Background refresh configuration
+# Seconds between background snapshot refreshes (0 disables the refresher thread)
+REFRESH_INTERVAL = int(os.environ.get('REFRESH_INTERVAL', 300))
+# Age in seconds after which a served snapshot triggers a background revalidation
+SNAPSHOT_TTL = int(os.environ.get('SNAPSHOT_TTL', 300))
+# Stream the page block by block while fetching when no snapshot exists yet
+STREAM_RENDER = os.environ.get('STREAM_RENDER', 'true').lower() == 'true'
+
+# Response caching and compression configuration
+COMPRESS_MIN_BYTES = 1024  # Smaller bodies are sent uncompressed
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'application/xml', 'image/svg+xml'
+}
+GZIP_LEVEL = 6  # On-the-fly levels; precompressed assets use the maximum
+BROTLI_QUALITY = 5
+ASSET_DIRS = ('public', 'static')  # Directories precompressed by `python main.py precompress`
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 24 * 3600))
+# Cache-Control by endpoint; pages and feed APIs revalidate against their ETag
+CACHE_POLICIES = {
+    'root': 'no-cache',
+    'api_feeds': 'no-cache',
+    'api_feed_items': 'no-cache',
+    'search_items': 'public, max-age=60',
+    'api_timeline': 'public, max-age=60',
+    'health': 'no-store',
+    'stats': 'no-store',
+    'metrics': 'no-store',
+    'breakers': 'no-store',
+    'debug': 'no-store',
+}
+DEFAULT_CACHE_POLICY = 'public, max-age=300'
+ERROR_CACHE_POLICY = 'no-store'
+
+# Logging and metrics configuration
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()  # DEBUG shows every fetch
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()  # 'text' or 'json'
+# Upper bounds in seconds of the latency histogram buckets on /metrics
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format records as text with key=value fields, or as one JSON object per line
+
+    Fields passed to log() as keyword arguments are appended to the message.
+    """
+
+    def __init__(self, as_json=False):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        if self.as_json:
+            payload = {
+                'ts': round(record.created, 3),
+                'level': record.levelname,
+                'msg': record.getMessage(),
+                **fields
+            }
+            if record.exc_info:
+                payload['exc'] = self.formatException(record.exc_info)
+            return json.dumps(payload, default=str)
+
+        text = f"[{record.levelname}] {record.getMessage()}"
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+logger = logging.getLogger('prawnfeeds')
+
+
+def configure_logging():
+    """Send the app's log records to stderr at LOG_LEVEL in LOG_FORMAT"""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(as_json=LOG_FORMAT == 'json'))
+    logger.handlers[:] = [handler]
+    logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    logger.propagate = False
+
+
+configure_logging()
+
+
+def log(message, *args, level=logging.INFO, exc_info=False, **fields):
+    """Log message % args at level, with optional structured fields
+
+    Nothing is formatted when the level is disabled, so callers should pass
+    values as args rather than pre-formatting the message.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, *args, exc_info=exc_info,
+                   extra={'fields': fields} if fields else None)
+
+
+class Metrics:
+    """In-process Prometheus counters and histograms
+
+    Series are keyed by metric name and label values; render() produces the
+    text exposition format served on /metrics.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        """Register a metric's type ('counter' or 'histogram') and help text"""
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @staticmethod
+    def _labels(pairs, extra=()):
+        pairs = tuple(pairs) + tuple(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for _, value in pairs)
+        return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(series[0]), series[1], series[2]))
+                                for key, series in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def header(name, default_kind):
+            if name not in described:
+                described.add(name)
+                kind, help_text = self._help.get(name, (default_kind, ''))
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{self._labels(labels)} {value}')
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{self._labels(labels)} {round(total, 6)}')
+            lines.append(f'{name}_count{self._labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics(METRICS_BUCKETS)
+METRICS.describe('prawnfeeds_fetch_requests_total', 'counter',
+                 'Upstream fetches by source and cache outcome '
+                 '(fresh, revalidated/304, unchanged, fetched, error)')
+METRICS.describe('prawnfeeds_fetch_phase_seconds', 'histogram',
+                 'Time spent per fetch phase '
+                 '(connect, ttfb, download, parse_wait, parse, normalize, total)')
+METRICS.describe('prawnfeeds_fetch_queue_wait_seconds', 'histogram',
+                 'Time fetch jobs waited for a worker, by job')
+METRICS.describe('prawnfeeds_fetch_timeouts_total', 'counter',
+                 'Fetch jobs still pending at the snapshot deadline, by job')
+METRICS.describe('prawnfeeds_snapshot_build_seconds', 'histogram',
+                 'Time to fetch every source for a snapshot')
+METRICS.describe('prawnfeeds_render_seconds', 'histogram',
+                 'Time to render the page from a built snapshot')
+METRICS.describe('prawnfeeds_single_flight_total', 'counter',
+                 'Calls by flight (snapshot, fetch) and role; followers shared a '
+                 'leader\'s in-flight work instead of repeating it')
+METRICS.describe('prawnfeeds_thumbnails_total', 'counter',
+                 'Thumbnail proxy requests by outcome (hit, resized, passthrough, error)')
+
+
+def finish_fetch_timing(source, url, outcome):
+    """Publish the current thread's fetch timings to METRICS and the debug log"""
+    phases = stop_fetch_timing()
+    for phase, seconds in phases.items():
+        METRICS.observe('prawnfeeds_fetch_phase_seconds', seconds, source=source, phase=phase)
+    log("Fetched %s", url, level=logging.DEBUG, source=source, outcome=outcome,
+        **{f'{phase}_ms': round(seconds * 1000, 1) for phase, seconds in phases.items()})
+
+
+# Security: Allowed schemes and blocked hosts for SSRF protection
+ALLOWED_SCHEMES = {'http', 'https'}
+BLOCKED_HOSTS = {'localhost', 'localhost.localdomain',
+                 '127.0.0.1', '0.0.0.0', '0', '169.254.169.254', '::1'}
+
+
+def is_safe_url(url):
+    """Validate URL to prevent SSRF attacks"""
+    try:
+        parsed = urlparse(url)
+        # Check scheme
+        if parsed.scheme.lower() not in ALLOWED_SCHEMES:
+            log("Blocked URL with invalid scheme: %s", url, level=logging.WARNING)
+            return False
+        # Check for blocked hostnames
+        hostname = parsed.hostname
+        if hostname is None:
+            log("Blocked URL with missing hostname: %s", url, level=logging.WARNING)
+            return False
+        if hostname.lower() in BLOCKED_HOSTS:
+            log("Blocked URL with forbidden host: %s", url, level=logging.WARNING)
+            return False
+        # Check for private/internal IP addresses
+        try:
+            if not is_public_ip(hostname):
+                log("Blocked URL with private/internal IP: %s", url, level=logging.WARNING)
+                return False
+        except ValueError:
+            pass  # Not an IP address, hostname is fine
+        return True
+    except Exception as e:
+        log("Error validating URL %s: %s", url, e, level=logging.WARNING)
+        return False
+
+
+def is_public_ip(address):
+    """True unless an IP address is private, loopback, link-local or otherwise internal
+
+    Raises:
+        ValueError if address is not an IP address
+    """
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified)
+
+
+def resolves_publicly(hostname):
+    """True if hostname resolves, and only to public addresses
+
+    Catches names and shorthand IPs (127.1, 2130706433) that point inside
+    the network, which is_safe_url cannot see from the URL alone.
+    """
+    try:
+        infos = socket.getaddrinfo(hostname, None, proto=socket.IPPROTO_TCP)
+        addresses = {info[4][0] for info in infos}
+        return bool(addresses) and all(is_public_ip(address) for address in addresses)
+    except (OSError, UnicodeError, ValueError):
+        return False
+
+
+# Second-level labels that are part of a country-code suffix (e.g. com.sg, co.uk)
+_CCTLD_SECOND_LEVELS = {'ac', 'co', 'com', 'edu', 'gov', 'net', 'org'}
+
+
+def host_key(url):
+    """Group a URL by site so shared hosts like *.github.io count as one origin"""
+    hostname = (urlparse(url).hostname or '').lower().rstrip('.')
+    labels = hostname.split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _CCTLD_SECOND_LEVELS:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+class HostRateLimiter:
+    """Politeness scheduler that spaces out requests to the same site
+
+    Each site gets a queue of slots min_interval apart. A request to a site
+    that has not been contacted recently goes out immediately; only requests
+    sharing a site with a recent one wait for their reserved slot.
+    """
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url):
+        """Reserve the next slot for the URL's site and return the delay until it"""
+        key = host_key(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(key, now))
+            self._next_slot[key] = slot + self.min_interval
+        return slot - now
+
+    def wait(self, url):
+        """Block until the URL's site may be contacted again"""
+        delay = self.reserve(url)
+        if delay > 0:
+            log("Rate limiting %s: waiting %.2fs", host_key(url), delay, level=logging.DEBUG)
+            time.sleep(delay)
+        return delay
+
+
+HOST_LIMITER = HostRateLimiter(HOST_MIN_INTERVAL)
+
+
+class RetryAfterBackoff:
+    """Backoff state shared by every thread talking to one rate-limited API
+
+    After a failure, requests are held off until the server's Retry-After
+    has passed or, without one, for an exponentially growing delay. Callers
+    check remaining() and skip the request instead of sleeping.
+    """
+
+    def __init__(self, base_delay, max_delay):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds until requests may be sent again (0 if not backing off)"""
+        with self._lock:
+            return max(self._blocked_until - time.monotonic(), 0)
+
+    def failure(self, retry_after=None):
+        """Record a failed request and return the backoff delay it starts"""
+        with self._lock:
+            self.failures += 1
+            if retry_after is None:
+                retry_after = self.base_delay * 2 ** (self.failures - 1)
+            delay = min(retry_after, self.max_delay)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            return delay
+
+    def success(self):
+        """Record a successful request, resetting the backoff"""
+        with self._lock:
+            self.failures = 0
+            self._blocked_until = 0.0
+
+
+REDDIT_BACKOFF = RetryAfterBackoff(REDDIT_BACKOFF_BASE, REDDIT_BACKOFF_MAX)
+
+
+class CircuitBreakers:
+    """Per-key circuit breakers for upstreams that keep failing
+
+    A key is 'closed' while its fetches succeed. After failure_threshold
+    consecutive failures, where a fetch slower than slow_seconds also counts,
+    it opens and allow() refuses it for a cooldown that doubles with every
+    trip. Once the cooldown has passed the breaker is 'half_open' and lets a
+    single probe through; success closes it again, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold, slow_seconds, base_cooldown, max_cooldown):
+        self.failure_threshold = failure_threshold
+        self.slow_seconds = slow_seconds
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, key):
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = {
+                'state': 'closed', 'failures': 0, 'trips': 0, 'open_until': 0.0,
+                'probing': False, 'last_error': None, 'last_latency': None,
+                'avg_latency': None, 'last_success': None, 'last_failure': None
+            }
+        return state
+
+    def allow(self, key):
+        """Return True if a fetch for key may go out now"""
+        with self._lock:
+            state = self._states.get(key)
+            if state is None or state['state'] == 'closed':
+                return True
+            if state['state'] == 'open':
+                if time.time() < state['open_until']:
+                    return False
+                state['state'] = 'half_open'
+            # Half-open: only one probe at a time
+            if state['probing']:
+                return False
+            state['probing'] = True
+            return True
+
+    def record(self, key, latency, error=None):
+        """Record a fetch's latency and its error message (None on success)"""
+        if error is None and latency > self.slow_seconds:
+            error = f'Slow response ({latency:.1f}s)'
+        now = time.time()
+        with self._lock:
+            state = self._state(key)
+            state['probing'] = False
+            state['last_latency'] = round(latency, 3)
+            avg = state['avg_latency']
+            state['avg_latency'] = round(latency if avg is None else 0.8 * avg + 0.2 * latency, 3)
+
+            if error is None:
+                if state['state'] != 'closed':
+                    log("Circuit closed for %s", key)
+                state.update(state='closed', failures=0, trips=0, last_success=now)
+                return
+
+            state['failures'] += 1
+            state['last_error'] = error
+            state['last_failure'] = now
+            if state['state'] == 'half_open' or state['failures'] >= self.failure_threshold:
+                cooldown = min(self.base_cooldown * 2 ** state['trips'], self.max_cooldown)
+                state['trips'] += 1
+                state['state'] = 'open'
+                state['open_until'] = now + cooldown
+                log("Circuit open for %s for %ss after %s failures: %s",
+                    key, cooldown, state['failures'], error, level=logging.WARNING)
+
+    def snapshot(self):
+        """Return a copy of every tracked breaker, keyed by key"""
+        now = time.time()
+        with self._lock:
+            states = {}
+            for key, state in self._states.items():
+                state = dict(state)
+                if state['state'] == 'open':
+                    state['retry_in'] = max(round(state['open_until'] - now), 0)
+                states[key] = state
+            return states
+
+    def stats(self):
+        """Count tracked breakers by state"""
+        counts = {'closed': 0, 'open': 0, 'half_open': 0}
+        with self._lock:
+            for state in self._states.values():
+                counts[state['state']] += 1
+        return counts
+
+
+FEED_BREAKERS = CircuitBreakers(BREAKER_FAILURE_THRESHOLD, BREAKER_SLOW_SECONDS,
+                                BREAKER_BASE_COOLDOWN, BREAKER_MAX_COOLDOWN)
+
+
+class PollScheduler:
+    """Per-feed polling intervals learned from publish history
+
+    Each network round trip for a feed is observed with its outcome and the
+    publish times of its items. The interval is POLL_CADENCE_FRACTION of the
+    feed's typical gap between posts (or of the time since its last post,
+    if that is longer, so dormant feeds slow down), stretched by up to 2x by
+    how often polls come back unchanged. Feeds without publish dates back
+    off by doubling per unchanged poll. Intervals stay within
+    [min_interval, max_interval]; unknown feeds get min_interval.
+    """
+
+    def __init__(self, min_interval, max_interval, fraction):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.fraction = fraction
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    def interval(self, key):
+        """Seconds the feed's cached response may be served before polling again"""
+        with self._lock:
+            feed = self._feeds.get(key)
+            return feed['interval'] if feed else self.min_interval
+
+    def observe(self, key, outcome, timestamps=()):
+        """Record a poll outcome ('revalidated', 'unchanged' or 'fetched')"""
+        import statistics
+
+        changed = outcome == 'fetched'
+        with self._lock:
+            feed = self._feeds.setdefault(key, {
+                'polls': 0, 'unchanged_rate': 0.0, 'unchanged_streak': 0,
+                'cadence': None, 'last_published': None, 'interval': self.min_interval
+            })
+            feed['polls'] += 1
+            feed['unchanged_rate'] = round(
+                0.8 * feed['unchanged_rate'] + (0.0 if changed else 0.2), 3)
+            feed['unchanged_streak'] = 0 if changed else feed['unchanged_streak'] + 1
+
+            if changed:
+                recent = sorted({ts for ts in timestamps if ts}, reverse=True)[:POLL_HISTORY]
+                feed['last_published'] = recent[0] if recent else None
+                feed['cadence'] = (statistics.median(
+                    newer - older for newer, older in zip(recent, recent[1:]))
+                    if len(recent) >= 2 else None)
+
+            if feed['cadence'] is not None:
+                base = max(feed['cadence'], time.time() - feed['last_published'])
+                interval = base * self.fraction * (1 + feed['unchanged_rate'])
+            else:
+                interval = self.min_interval * 2 ** min(feed['unchanged_streak'], 8)
+            feed['interval'] = int(min(max(interval, self.min_interval), self.max_interval))
+
+    def stats(self):
+        """Summarize learned intervals across feeds
+
+        Feeds with a zero interval (POLL_MIN_INTERVAL=0) are polled on every
+        refresh, at no fixed rate, and are left out of polls_per_hour.
+        """
+        with self._lock:
+            intervals = sorted(feed['interval'] for feed in self._feeds.values())
+        if not intervals:
+            return {'feeds': 0}
+        return {
+            'feeds': len(intervals),
+            'min_interval': intervals[0],
+            'median_interval': intervals[len(intervals) // 2],
+            'max_interval': intervals[-1],
+            'polls_per_hour': round(sum(3600 / interval for interval in intervals if interval), 1)
+        }
+
+
+FEED_POLLER = PollScheduler(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_CADENCE_FRACTION)
+
+
+def observe_feed_poll(source, url, name):
+    """on_outcome callback feeding a feed's poll results to FEED_POLLER and the item store"""
+    def observe(outcome, data):
+        items = data.get('items', []) if isinstance(data, dict) else data
+        FEED_POLLER.observe(url, outcome, [item.get('published_ts') for item in items])
+        if outcome == 'fetched':
+            store_items(source, name, items)
+    return observe
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+_timed_pool_classes = None
+
+
+def instrument_adapter(adapter):
+    """Make a requests adapter report connection setup time as the 'connect' phase
+
+    Connections opened by the adapter's pools time their TCP (and TLS)
+    setup into the current thread's fetch timing; reused connections add
+    nothing.
+    """
+    global _timed_pool_classes
+    if _timed_pool_classes is None:
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        def timed_connection(base):
+            class TimedConnection(base):
+                def connect(self):
+                    started = time.perf_counter()
+                    try:
+                        super().connect()
+                    finally:
+                        record_phase('connect', time.perf_counter() - started)
+            return TimedConnection
+
+        _timed_pool_classes = {
+            'http': type('TimedHTTPConnectionPool', (HTTPConnectionPool,),
+                         {'ConnectionCls': timed_connection(HTTPConnection)}),
+            'https': type('TimedHTTPSConnectionPool', (HTTPSConnectionPool,),
+                          {'ConnectionCls': timed_connection(HTTPSConnection)}),
+        }
+    adapter.poolmanager.pool_classes_by_scheme = _timed_pool_classes
+    return adapter
+
+
+def get_http_session():
+    """Return the process-wide requests session with keep-alive pools
+
+    Connections are reused across fetches and refresh cycles, so repeated
+    requests to the same host skip the TCP+TLS handshake.
+    """
+    global _http_session
+    if _http_session is not None:
+        return _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            default_adapter = instrument_adapter(HTTPAdapter(
+                pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE))
+            session.mount('http://', default_adapter)
+            session.mount('https://', default_adapter)
+            for prefix, size in HOST_POOL_SIZES.items():
+                session.mount(prefix, instrument_adapter(
+                    HTTPAdapter(pool_connections=1, pool_maxsize=size)))
+            _http_session = session
+            log("Created HTTP session (%s dedicated host pools)", len(HOST_POOL_SIZES))
+    return _http_session
+
+
+_image_session = None
+
+
+def get_image_session():
+    """Return the session used for URLs taken from feed content
+
+    Its connections check the peer address right after connecting and
+    refuse anything that is not public, so a name that re-resolves to an
+    internal address between the pre-flight check and the connect is still
+    refused. Proxy settings from the environment are ignored, since a proxy
+    would hide the real peer.
+    """
+    global _image_session
+    if _image_session is not None:
+        return _image_session
+    with _http_session_lock:
+        if _image_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.connection import HTTPConnection, HTTPSConnection
+            from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+            def public_connection(base):
+                class PublicPeerConnection(base):
+                    def _new_conn(self):
+                        sock = super()._new_conn()
+                        address = sock.getpeername()[0]
+                        if not is_public_ip(address):
+                            sock.close()
+                            raise ValueError(f"Refusing non-public address {address}")
+                        return sock
+                return PublicPeerConnection
+
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE)
+            adapter.poolmanager.pool_classes_by_scheme = {
+                'http': type('PublicHTTPConnectionPool', (HTTPConnectionPool,),
+                             {'ConnectionCls': public_connection(HTTPConnection)}),
+                'https': type('PublicHTTPSConnectionPool', (HTTPSConnectionPool,),
+                              {'ConnectionCls': public_connection(HTTPSConnection)}),
+            }
+            session = requests.Session()
+            session.trust_env = False
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _image_session = session
+    return _image_session
+
+
+def pool_stats():
+    """Return per-host connection pool statistics for the shared session"""
+    if _http_session is None:
+        return {}
+    stats = {}
+    adapters = {id(adapter): adapter for adapter in _http_session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened = pool.num_connections
+            served = pool.num_requests
+            stats[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'connections_opened': opened,
+                'requests': served,
+                'connections_reused': max(served - opened, 0),
+                'idle_connections': sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+                'max_size': adapter._pool_maxsize
+            }
+    return stats
+
+
+class LRUCache:
+    """Thread-safe in-memory cache bounded by entry count and total size
+
+    Values are stored as-is and shared with callers, so they must be treated
+    as read-only. The least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, size=0):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+class SQLiteCache:
+    """On-disk cache tier storing JSON strings in a local SQLite file
+
+    Survives process restarts (e.g. Vercel cold starts on a warm /tmp).
+    Rows beyond max_entries are evicted least recently used first.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed_at REAL NOT NULL)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)')
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                'UPDATE cache SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, accessed_at) VALUES (?, ?, ?)',
+                (key, value, time.time()))
+            self._writes += 1
+            # Trim occasionally rather than counting rows on every write
+            if self._writes % 50 == 0:
+                cursor = self._conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+                self.evictions += max(cursor.rowcount, 0)
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        return {
+            'path': self.path,
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class TieredCache:
+    """Cache with an in-memory LRU tier in front of an optional on-disk tier
+
+    Values must be JSON-serializable. Reads promote disk hits into memory;
+    writes go through to both tiers.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        try:
+            raw = self.disk.get(key)
+        except sqlite3.Error as e:
+            log("Error reading disk cache for %s: %s", key, e, level=logging.ERROR)
+            return None
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        self.memory.set(key, value, len(raw))
+        return value
+
+    def set(self, key, value):
+        raw = json.dumps(value)
+        self.memory.set(key, value, len(raw))
+        if self.disk is not None:
+            try:
+                self.disk.set(key, raw)
+            except sqlite3.Error as e:
+                log("Error writing disk cache for %s: %s", key, e, level=logging.ERROR)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self):
+        return {
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None
+        }
+
+
+class DiskLRUCache:
+    """Directory of binary blobs bounded by total size
+
+    Each key is stored as one file. Recency is tracked in memory and seeded
+    from file modification times at startup, so the least recently used
+    files are deleted first once max_bytes is exceeded. Keys must be safe to
+    use as file names.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> size
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _evict(self):
+        while self._entries and self._bytes > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), 'rb') as f:
+                value = f.read()
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            # Removed by another worker sharing the directory
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._bytes -= size
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        # Write to a private temp file and rename so readers never see a partial blob
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old
+            self._entries[key] = len(value)
+            self._bytes += len(value)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'path': self.directory,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+def create_feed_cache():
+    """Build the feed cache, falling back to memory-only if SQLite is unusable"""
+    disk = None
+    if CACHE_DB_PATH:
+        try:
+            disk = SQLiteCache(CACHE_DB_PATH, CACHE_DISK_MAX_ENTRIES)
+        except sqlite3.Error as e:
+            log("Disk cache unavailable at %s, using memory only: %s",
+                CACHE_DB_PATH, e, level=logging.WARNING)
+    return TieredCache(LRUCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES), disk)
+
+
+# Cache for conditional GETs
 # Format: { url: { 'etag': '...', 'last_modified': '...', 'data': {...} } }
-FEED_CACHE = {}
+FEED_CACHE = create_feed_cache()
+
+
+class ItemStore:
+    """Persistent history of fetched items with a full-text index
+
+    Items are deduplicated by GUID, falling back to their link, and their
+    titles and feed names are indexed in an FTS5 table kept in sync by
+    triggers. Each item sorts by its publish time (never later than when it
+    was first seen) or, without one, by when it was first seen; the
+    timeline pages through that order with a (sort_ts, id) keyset cursor,
+    so deep pages cost the same as the first.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                uid TEXT NOT NULL UNIQUE,
+                source TEXT NOT NULL,
+                feed TEXT NOT NULL,
+                title TEXT NOT NULL,
+                link TEXT NOT NULL,
+                thumbnail TEXT NOT NULL,
+                published_ts INTEGER,
+                first_seen INTEGER NOT NULL,
+                sort_ts INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS items_timeline ON items (sort_ts DESC, id DESC);
+            CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+                title, feed, content='items', content_rowid='id');
+            CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+                INSERT INTO items_fts (rowid, title, feed) VALUES (new.id, new.title, new.feed);
+            END;
+            CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+                INSERT INTO items_fts (items_fts, rowid, title, feed)
+                VALUES ('delete', old.id, old.title, old.feed);
+            END;
+            CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF title, feed ON items BEGIN
+                INSERT INTO items_fts (items_fts, rowid, title, feed)
+                VALUES ('delete', old.id, old.title, old.feed);
+                INSERT INTO items_fts (rowid, title, feed) VALUES (new.id, new.title, new.feed);
+            END;
+        """)
+        self._conn.commit()
+
+    def upsert(self, source, feed, items):
+        """Insert new items and update changed ones, returning the rows written"""
+        now = int(time.time())
+        rows = []
+        for item in items:
+            uid = item.get('guid') or item.get('link')
+            if not uid or uid == '#':
+                continue
+            published = item.get('published_ts')
+            rows.append((uid, source, feed, item.get('title', ''), item.get('link', ''),
+                         item.get('thumbnail', ''), published, now,
+                         min(published, now) if published else now))
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            # Unchanged rows are left alone so their index entries are not rewritten
+            self._conn.executemany("""
+                INSERT INTO items (uid, source, feed, title, link, thumbnail,
+                                   published_ts, first_seen, sort_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (uid) DO UPDATE SET
+                    title = excluded.title,
+                    link = excluded.link,
+                    thumbnail = excluded.thumbnail,
+                    published_ts = COALESCE(excluded.published_ts, items.published_ts),
+                    sort_ts = CASE WHEN excluded.published_ts IS NULL THEN items.sort_ts
+                                   ELSE MIN(excluded.published_ts, items.first_seen) END
+                WHERE items.title IS NOT excluded.title
+                   OR items.link IS NOT excluded.link
+                   OR items.thumbnail IS NOT excluded.thumbnail
+                   OR COALESCE(excluded.published_ts, items.published_ts)
+                      IS NOT items.published_ts
+            """, rows)
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    _COLUMNS = ('items.id, items.source, items.feed, items.title, items.link, '
+                'items.thumbnail, items.published_ts, items.sort_ts')
+
+    @staticmethod
+    def _row(row):
+        item_id, source, feed, title, link, thumbnail, published_ts, sort_ts = row
+        return {
+            'title': title,
+            'link': link,
+            'thumbnail': thumbnail,
+            'published_ts': published_ts,
+            'source': source,
+            'feed': feed,
+            'cursor': f'{sort_ts}:{item_id}'
+        }
+
+    def timeline(self, limit, before=None):
+        """Latest items across all feeds, strictly older than the before cursor"""
+        sql = f'SELECT {self._COLUMNS} FROM items'
+        params = []
+        if before is not None:
+            sql += ' WHERE (sort_ts, id) < (?, ?)'
+            params.extend(before)
+        sql += ' ORDER BY sort_ts DESC, id DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            return [self._row(row) for row in self._conn.execute(sql, params)]
+
+    def search(self, query, limit, offset=0):
+        """Items whose title or feed name match every word of query
+
+        Results come newest-stored first, which FTS5 can walk in rowid
+        order and stop after limit; ranking by relevance would score every
+        match before returning any.
+        """
+        # Quote each word so user input cannot inject FTS5 query syntax
+        terms = ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+        if not terms:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {self._COLUMNS} FROM items_fts '
+                'JOIN items ON items.id = items_fts.rowid '
+                'WHERE items_fts MATCH ? ORDER BY items_fts.rowid DESC LIMIT ? OFFSET ?',
+                (terms, limit, offset)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        return {'path': self.path, 'items': entries}
+
+
+def create_item_store():
+    """Open the item store, or return None if it is disabled or SQLite is unusable"""
+    if not ITEM_DB_PATH:
+        return None
+    try:
+        return ItemStore(ITEM_DB_PATH)
+    except sqlite3.Error as e:
+        log("Item store unavailable at %s: %s", ITEM_DB_PATH, e, level=logging.WARNING)
+        return None
+
+
+ITEM_STORE = create_item_store()
+
+
+def store_items(source, feed, items):
+    """Record freshly parsed items in the item store, if it is enabled"""
+    if ITEM_STORE is None or not items:
+        return
+    try:
+        written = ITEM_STORE.upsert(source, feed, items)
+        if written:
+            log("Stored %s new or changed items from %s", written, feed, level=logging.DEBUG)
+    except sqlite3.Error as e:
+        log("Error storing items from %s: %s", feed, e, level=logging.ERROR)
+
+
+def create_thumb_cache():
+    """Open the thumbnail directory, or return None if it is disabled or unwritable"""
+    if not THUMB_CACHE_DIR:
+        return None
+    try:
+        return DiskLRUCache(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES)
+    except OSError as e:
+        log("Thumbnail cache unavailable at %s: %s", THUMB_CACHE_DIR, e, level=logging.WARNING)
+        return None
+
+
+THUMB_CACHE = create_thumb_cache()
+
+# Image types served unmodified when Pillow is not installed; SVG is left out
+# because it can carry script and would run on this origin
+PASSTHROUGH_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif'}
+
+IMAGE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; PrawnFeeds/1.0; +http://localhost:3000)',
+    'Accept': 'image/avif,image/webp,image/*;q=0.8'
+}
+
+
+def fetch_image(url):
+    """Download an image, re-checking every redirect target against is_safe_url
+    and resolves_publicly
+
+    Returns:
+        (body bytes, lowercased Content-Type without parameters)
+
+    Raises:
+        ValueError if a URL is unsafe, there are too many redirects or the
+        body exceeds THUMB_MAX_SOURCE_BYTES; requests exceptions on HTTP errors
+    """
+    session = get_image_session()
+    for _ in range(THUMB_MAX_REDIRECTS + 1):
+        if not is_safe_url(url) or not resolves_publicly(urlparse(url).hostname):
+            raise ValueError('Unsafe URL')
+        with session.get(url, headers=IMAGE_HEADERS, timeout=10, stream=True,
+                         allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['Location'])
+                continue
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=FEED_CHUNK_SIZE):
+                body += chunk
+                if len(body) > THUMB_MAX_SOURCE_BYTES:
+                    raise ValueError(f"Image exceeds {THUMB_MAX_SOURCE_BYTES} bytes")
+            return bytes(body), content_type
+    raise ValueError('Too many redirects')
+
+
+def resize_thumbnail(body):
+    """Crop and scale an image to THUMB_SIZE and recompress it
+
+    Returns:
+        (thumbnail bytes, content type), or None if Pillow is not installed
+
+    Raises:
+        ValueError if the image would decode to more than THUMB_MAX_SOURCE_PIXELS
+    """
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:
+        return None
+
+    with Image.open(io.BytesIO(body)) as image:
+        # Let the JPEG decoder downscale by a power of two while decoding
+        image.draft('RGB', (THUMB_SIZE[0] * 2, THUMB_SIZE[1] * 2))
+        # Only the header has been read so far; refuse before decoding pixels
+        width, height = image.size
+        if width * height > THUMB_MAX_SOURCE_PIXELS:
+            raise ValueError(f"Image is {width}x{height}, over {THUMB_MAX_SOURCE_PIXELS} pixels")
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        thumb = ImageOps.fit(image, THUMB_SIZE, Image.Resampling.LANCZOS)
+
+    out = io.BytesIO()
+    if features.check('webp'):
+        thumb.save(out, 'WEBP', quality=THUMB_QUALITY, method=4)
+        return out.getvalue(), 'image/webp'
+    thumb.convert('RGB').save(out, 'JPEG', quality=THUMB_QUALITY, optimize=True, progressive=True)
+    return out.getvalue(), 'image/jpeg'
+
+
+def make_thumbnail(url):
+    """Return (bytes, content type, outcome) for a thumbnail, using THUMB_CACHE
+
+    Without Pillow the original image is passed through unchanged, so the
+    page still gets long-lived caching but no size reduction.
+    """
+    key = hashlib.blake2b(f"{url}|{THUMB_SIZE}|{THUMB_QUALITY}".encode(),
+                          digest_size=16).hexdigest()
+    if THUMB_CACHE is not None:
+        cached = THUMB_CACHE.get(key)
+        if cached is not None:
+            content_type, _, data = cached.partition(b'\n')
+            return data, content_type.decode(), 'hit'
+
+    body, source_type = fetch_image(url)
+    resized = resize_thumbnail(body)
+    if resized is not None:
+        data, content_type = resized
+        outcome = 'resized'
+    elif source_type in PASSTHROUGH_IMAGE_TYPES:
+        data, content_type = body, source_type
+        outcome = 'passthrough'
+    else:
+        raise ValueError(f"Unsupported image type {source_type or 'unknown'}")
+
+    if THUMB_CACHE is not None:
+        try:
+            THUMB_CACHE.set(key, content_type.encode() + b'\n' + data)
+        except OSError as e:
+            log("Error writing thumbnail cache for %s: %s", url, e, level=logging.ERROR)
+    log("Thumbnail %s: %s bytes -> %s bytes (%s)", url, len(body), len(data), outcome,
+        level=logging.DEBUG)
+    return data, content_type, outcome
+
+
+class HTTPCacheStats:
+    """Per-source counters for the shared HTTP cache
+
+    Outcomes: 'fresh' (served without touching the network), 'revalidated'
+    (304 Not Modified), 'unchanged' (full response whose body hash matched
+    the cached one, so parsing was skipped), 'fetched' (full response that
+    was parsed) and 'error'.
+    """
+
+    OUTCOMES = ('fresh', 'revalidated', 'unchanged', 'fetched', 'error')
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, source, outcome):
+        METRICS.inc('prawnfeeds_fetch_requests_total', source=source, outcome=outcome)
+        with self._lock:
+            counts = self._counts.setdefault(
+                source, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for source, counts in self._counts.items():
+                total = sum(counts.values())
+                hits = counts['fresh'] + counts['revalidated'] + counts['unchanged']
+                result[source] = dict(
+                    counts, hit_rate=round(hits / total, 3) if total else 0.0)
+            return result
+
+
+HTTP_CACHE_STATS = HTTPCacheStats()
+
+
+def freshness_lifetime(response, source, ttl=None, min_ttl=0):
+    """Return how many seconds a response may be served without revalidation
+
+    Honours Cache-Control max-age/no-cache/no-store and Expires, capped at
+    HTTP_CACHE_MAX_TTL and floored at the source's SOURCE_MIN_TTL and at
+    min_ttl. A fixed ttl overrides the response headers entirely.
+    """
+    if ttl is not None:
+        return ttl
+
+    lifetime = 0
+    cache_control = response.headers.get('Cache-Control', '').lower()
+    directives = [d.strip() for d in cache_control.split(',') if d.strip()]
+    max_age = None
+    for directive in directives:
+        if directive in ('no-cache', 'no-store'):
+            max_age = 0
+            break
+        if directive.startswith('max-age='):
+            try:
+                max_age = int(directive.split('=', 1)[1].strip('"'))
+            except ValueError:
+                pass
+
+    if max_age is not None:
+        lifetime = max_age
+    elif response.headers.get('Expires'):
+        from email.utils import parsedate_to_datetime
+        try:
+            expires = parsedate_to_datetime(response.headers['Expires'])
+            date = response.headers.get('Date')
+            base = parsedate_to_datetime(date).timestamp() if date else time.time()
+            lifetime = expires.timestamp() - base
+        except (TypeError, ValueError, IndexError):
+            lifetime = 0  # Invalid Expires means already expired
+
+    lifetime = min(max(lifetime, 0), HTTP_CACHE_MAX_TTL)
+    return max(lifetime, SOURCE_MIN_TTL.get(source, 0), min_ttl)
+
+
+class SingleFlight:
+    """Coalesces concurrent work on the same key into one execution
+
+    The first caller for a key becomes its leader and does the work; callers
+    arriving while it is in flight become followers that wait for and share
+    the leader's result or exception instead of repeating it. Followers wait
+    at most timeout seconds, so a hung leader cannot hold them past the
+    fetch deadline.
+    """
+
+    def __init__(self, name, timeout=None):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}  # key -> Future of the in-flight call
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.max_in_flight = 0
+
+    def claim(self, key):
+        """Join or start the call for key
+
+        Returns:
+            (Future, is_leader); the leader must call resolve() for the key
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+                self.max_in_flight = max(self.max_in_flight, len(self._calls))
+            else:
+                self.followers += 1
+        METRICS.inc('prawnfeeds_single_flight_total', flight=self.name,
+                    role='leader' if leader else 'follower')
+        return future, leader
+
+    def resolve(self, key, result=None, error=None):
+        """Finish the call for key, handing its outcome to every follower"""
+        with self._lock:
+            future = self._calls.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def wait(self, future):
+        """Return the outcome of a followed call
+
+        Raises:
+            FuturesTimeoutError if the leader has not finished within timeout
+        """
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            log("Gave up waiting %.0fs for in-flight %s", self.timeout, self.name,
+                level=logging.WARNING)
+            raise
+
+    def do(self, key, fn, *args):
+        """Return fn(*args), sharing the call with concurrent callers for key"""
+        future, leader = self.claim(key)
+        if not leader:
+            log("Joining in-flight %s for %s", self.name, key, level=logging.DEBUG)
+            return self.wait(future)
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.resolve(key, error=e)
+            raise
+        self.resolve(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.leaders,
+                'shared': self.followers,
+                'max_in_flight': self.max_in_flight
+            }
+
+
+# In-flight upstream fetches, keyed like FEED_CACHE
+FETCH_FLIGHT = SingleFlight('fetch', FETCH_DEADLINE)
+
+
+class ParsePool:
+    """Process pool for CPU-bound feed parsing
+
+    Fetch threads only download; bodies are handed to worker processes, which
+    run feedparser and normalization outside this process's GIL and send back
+    the compact item dicts. Workers are started from a clean forkserver (or
+    spawn) process, since forking a process with live threads is unsafe, and
+    import only the side-effect-free parsing module. If the pool cannot be
+    created (e.g. no /dev/shm on serverless hosts) or breaks, parsing falls
+    back to the calling thread.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._warming = []
+        self._disabled = workers <= 0
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.inline = 0
+        self.restarts = 0
+
+    def start(self, wait=False):
+        """Create the workers and have each import its parsers right away
+
+        Args:
+            wait: If True, block until every worker is ready
+
+        Returns:
+            The executor, or None if parsing runs inline
+        """
+        with self._lock:
+            if self._executor is None and not self._disabled:
+                try:
+                    import importlib.util
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    # Workers re-run a __main__ script before their first job, which for
+                    # main.py (or bench.py) would rebuild the whole app, with its
+                    # databases, in every worker. A script has no import spec; giving it
+                    # parsing's while the workers are launched makes them import that
+                    # instead. It is only read when a worker process starts.
+                    main_module = sys.modules['__main__']
+                    is_script = getattr(main_module, '__spec__', None) is None
+                    if is_script:
+                        main_module.__spec__ = importlib.util.find_spec('parsing')
+                    try:
+                        method = ('forkserver'
+                                  if 'forkserver' in multiprocessing.get_all_start_methods()
+                                  else 'spawn')
+                        context = multiprocessing.get_context(method)
+                        if method == 'forkserver':
+                            context.set_forkserver_preload(['parsing'])
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers, initializer=init_parse_worker,
+                            mp_context=context)
+                        # One no-op per worker makes the pool launch all of them now
+                        self._warming = [self._executor.submit(init_parse_worker)
+                                         for _ in range(self.workers)]
+                    finally:
+                        if is_script:
+                            main_module.__spec__ = None
+                    log("Started %s parse worker processes (%s)", self.workers, method)
+                except Exception as e:
+                    log("Parse pool unavailable, parsing inline: %s", e, level=logging.WARNING)
+                    self._disabled = True
+            executor = self._executor
+        if wait and executor is not None:
+            try:
+                for future in self._warming:
+                    future.result()
+            except BrokenProcessPool as e:
+                log("Parse workers failed to start: %s", e, level=logging.ERROR)
+                self._discard(executor)
+                return None
+        return executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Stop the worker processes; anything parsed afterwards runs inline"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._disabled = True
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def parse(self, parse, body):
+        """Parse a body in a worker process, recording its phase timings
+
+        parse must be picklable and defined in the parsing module, e.g. one
+        of its functions or a functools.partial of one.
+        """
+        executor = self.start()
+        if executor is not None:
+            submitted = time.perf_counter()
+            try:
+                data, phases = executor.submit(parse_job, parse, body).result()
+            except BrokenProcessPool as e:
+                log("Parse pool broke, restarting it: %s", e, level=logging.ERROR)
+                self._discard(executor)
+            else:
+                for phase, seconds in phases.items():
+                    record_phase(phase, seconds)
+                record_phase('parse_wait', time.perf_counter() - submitted - sum(phases.values()))
+                with self._lock:
+                    self.parsed += 1
+                return data
+        with self._lock:
+            self.inline += 1
+        return timed_parse(parse, body)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers if self._executor is not None else 0,
+                'parsed': self.parsed,
+                'inline': self.inline,
+                'restarts': self.restarts
+            }
+
+
+PARSE_POOL = ParsePool(PARSE_WORKERS)
+atexit.register(PARSE_POOL.shutdown)
+
+
+def cached_request(url, source, parse, headers=None, method='GET', json_body=None,
+                   timeout=10, ttl=None, polite=False, read_body=None,
+                   min_ttl=0, on_outcome=None, parse_in_pool=False, revalidate=False):
+    """Fetch a URL through the shared HTTP cache
+
+    While a cached response is fresh the network is skipped entirely. Once
+    stale, it is revalidated with If-None-Match/If-Modified-Since and a 304
+    reuses the cached parse result. Anything else is fetched in full, and
+    if the body hashes the same as the cached one the previous parse result
+    is reused instead of parsing again. Callers asking for a resource that
+    is already being fetched wait for that fetch instead of starting another.
+
+    Every network round trip is timed by phase (rate_limit, connect, ttfb,
+    download, parse_wait, parse, normalize, total) into METRICS.
+
+    Args:
+        url: URL to request
+        source: Source label for per-source statistics ('rss', 'reddit', ...)
+        parse: Callable turning the response body bytes into JSON-serializable data
+        headers: Extra request headers
+        method: HTTP method; POST requests are keyed by their JSON body
+        json_body: JSON payload for POST requests
+        timeout: Request timeout in seconds
+        ttl: Fixed freshness lifetime overriding response cache headers
+        polite: If True, wait for the per-site rate limiter before requesting
+        read_body: Callable returning the body bytes of a response, which is
+            streamed so it can stop early (defaults to response.content)
+        min_ttl: Lower bound on the freshness lifetime, e.g. a learned polling interval
+        on_outcome: Callable receiving (outcome, data) after every network
+            round trip, with outcome 'revalidated', 'unchanged' or 'fetched'
+        parse_in_pool: If True, parse in PARSE_POOL; parse must then be picklable
+        revalidate: If True, go to the network even while the cached response is fresh
+
+    Returns:
+        The parsed data, either cached or freshly parsed
+
+    Raises:
+        requests.exceptions.RequestException on network errors and non-2xx
+        responses, or whatever parse raises
+    """
+    key = url if json_body is None else f"{method} {url} {json.dumps(json_body, sort_keys=True)}"
+    entry = FEED_CACHE.get(key)
+    if entry and not revalidate and entry.get('expires', 0) > time.time():
+        HTTP_CACHE_STATS.record(source, 'fresh')
+        log("Serving fresh cached response for %s", url, level=logging.DEBUG)
+        return entry['data']
+
+    def fetch(entry):
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        phases = start_fetch_timing()
+        outcome = 'error'
+        started = time.perf_counter()
+        try:
+            if polite:
+                record_phase('rate_limit', max(HOST_LIMITER.wait(url), 0.0))
+            request_started = time.perf_counter()
+            # Streamed so the body download is timed separately from the headers
+            response = get_http_session().request(
+                method, url, headers=request_headers, json=json_body, timeout=timeout,
+                stream=True)
+            headers_at = time.perf_counter()
+            record_phase('ttfb', headers_at - request_started - phases.get('connect', 0.0))
+
+            try:
+                if response.status_code == 304 and entry:
+                    log("Hit existing cache for %s (304)", url, level=logging.DEBUG)
+                    entry = dict(entry,
+                                 etag=response.headers.get('ETag', entry.get('etag')),
+                                 expires=time.time() + freshness_lifetime(
+                                     response, source, ttl, min_ttl))
+                    FEED_CACHE.set(key, entry)
+                    HTTP_CACHE_STATS.record(source, 'revalidated')
+                    outcome = 'revalidated'
+                    if on_outcome:
+                        on_outcome('revalidated', entry['data'])
+                    return entry['data']
+
+                response.raise_for_status()
+                body = read_body(response) if read_body else response.content
+                record_phase('download', time.perf_counter() - headers_at)
+            finally:
+                # Releases the connection even if a streamed body was not fully read
+                response.close()
+
+            body_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+            if entry and entry.get('body_hash') == body_hash:
+                log("Body unchanged for %s, reusing parsed result", url, level=logging.DEBUG)
+                data = entry['data']
+                outcome = 'unchanged'
+            else:
+                data = PARSE_POOL.parse(parse, body) if parse_in_pool else timed_parse(parse, body)
+                outcome = 'fetched'
+        except Exception:
+            HTTP_CACHE_STATS.record(source, 'error')
+            raise
+        finally:
+            record_phase('total', time.perf_counter() - started)
+            finish_fetch_timing(source, url, outcome)
+
+        HTTP_CACHE_STATS.record(source, outcome)
+        if on_outcome:
+            on_outcome(outcome, data)
+        if 'no-store' not in response.headers.get('Cache-Control', '').lower():
+            FEED_CACHE.set(key, {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'expires': time.time() + freshness_lifetime(response, source, ttl, min_ttl),
+                'body_hash': body_hash,
+                'data': data
+            })
+        return data
+
+    # Concurrent requests for the same resource share one upstream round trip
+    return FETCH_FLIGHT.do(key, fetch, entry)
+
+
+def feed_id(url):
+    """Stable short identifier for a feed, derived from its URL"""
+    return hashlib.blake2b(url.encode(), digest_size=6).hexdigest()
+
+
+class _Descriptor:
+    """Immutable, slot-based record compiled from feeds.json
+
+    Safe to share between concurrent requests and the background refresher.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class FeedDescriptor(_Descriptor):
+    __slots__ = ('id', 'name', 'url', 'limit')
+
+
+class SectionDescriptor(_Descriptor):
+    __slots__ = ('title', 'feeds')
+
+
+class YouTubeChannelDescriptor(_Descriptor):
+    __slots__ = ('id', 'channel_id', 'name', 'category', 'limit')
+
+
+class FeedsConfig(_Descriptor):
+    __slots__ = ('sections', 'subreddits', 'youtube_channels', 'twitch_channels', 'mtime')
+
+    def to_dict(self):
+        """Plain-dict form in the shape of feeds.json"""
+        return {
+            'sections': [
+                {'title': section.title,
+                 'feeds': [{'id': feed.id, 'name': feed.name, 'url': feed.url, 'limit': feed.limit}
+                           for feed in section.feeds]}
+                for section in self.sections
+            ],
+            'subreddits': list(self.subreddits),
+            'youtube_channels': [
+                {'id': channel.id, 'name': channel.name, 'channel_id': channel.channel_id,
+                 'category': channel.category, 'limit': channel.limit}
+                for channel in self.youtube_channels
+            ],
+            'twitch_channels': list(self.twitch_channels)
+        }
+
+
+EMPTY_CONFIG = FeedsConfig(sections=(), subreddits=(), youtube_channels=(),
+                           twitch_channels=(), mtime=None)
+
+_SUBREDDIT_RE = re.compile(r'^[A-Za-z0-9_]{2,21}$')
+_YOUTUBE_CHANNEL_RE = re.compile(r'^[A-Za-z0-9_-]{10,40}$')
+_TWITCH_LOGIN_RE = re.compile(r'^[A-Za-z0-9_]{2,25}$')
+
+
+def _positive_int(value, default):
+    return value if isinstance(value, int) and not isinstance(value, bool) and value > 0 else default
+
+
+def compile_feeds_config(raw, mtime=None):
+    """Validate parsed feeds.json and compile it into immutable descriptors
+
+    Invalid entries are logged and skipped rather than failing the whole
+    config. Feeds and YouTube channels get stable IDs derived from their URL
+    and channel ID; duplicates are dropped.
+
+    Args:
+        raw: Parsed feeds.json contents
+        mtime: Modification time the config was read at
+
+    Returns:
+        FeedsConfig
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("feeds.json must contain a JSON object")
+
+    seen_ids = set()
+    sections = []
+    for section in raw.get('sections', []):
+        if not isinstance(section, dict) or not isinstance(section.get('title'), str):
+            log("Skipping invalid section: %r", section, level=logging.WARNING)
+            continue
+        feeds = []
+        for feed in section.get('feeds', []):
+            if not isinstance(feed, dict) or not isinstance(feed.get('url'), str):
+                log("Skipping invalid feed in %s: %r",
+                    section['title'], feed, level=logging.WARNING)
+                continue
+            if not is_safe_url(feed['url']):
+                log("Skipping unsafe feed URL in %s: %s",
+                    section['title'], feed['url'], level=logging.WARNING)
+                continue
+            descriptor = FeedDescriptor(
+                id=feed_id(feed['url']),
+                name=str(feed.get('name') or feed['url']),
+                url=feed['url'],
+                limit=_positive_int(feed.get('limit'), 3))
+            if descriptor.id in seen_ids:
+                log("Skipping duplicate feed: %s", feed['url'], level=logging.WARNING)
+                continue
+            seen_ids.add(descriptor.id)
+            feeds.append(descriptor)
+        sections.append(SectionDescriptor(title=section['title'], feeds=tuple(feeds)))
+
+    subreddits = []
+    for subreddit in raw.get('subreddits', []):
+        if isinstance(subreddit, str) and _SUBREDDIT_RE.match(subreddit):
+            subreddits.append(subreddit)
+        else:
+            log("Skipping invalid subreddit: %r", subreddit, level=logging.WARNING)
+
+    youtube_channels = []
+    for channel in raw.get('youtube_channels', []):
+        if not isinstance(channel, dict) or not _YOUTUBE_CHANNEL_RE.match(str(channel.get('channel_id', ''))):
+            log("Skipping invalid YouTube channel: %r", channel, level=logging.WARNING)
+            continue
+        youtube_channels.append(YouTubeChannelDescriptor(
+            id=feed_id(channel['channel_id']),
+            channel_id=channel['channel_id'],
+            name=str(channel.get('name') or channel['channel_id']),
+            category=str(channel.get('category', 'General')),
+            limit=_positive_int(channel.get('limit'), 3)))
+
+    twitch_channels = []
+    for channel in raw.get('twitch_channels', []):
+        if isinstance(channel, str) and _TWITCH_LOGIN_RE.match(channel):
+            twitch_channels.append(channel)
+        else:
+            log("Skipping invalid Twitch channel: %r", channel, level=logging.WARNING)
+
+    return FeedsConfig(sections=tuple(sections), subreddits=tuple(subreddits),
+                       youtube_channels=tuple(youtube_channels),
+                       twitch_channels=tuple(twitch_channels), mtime=mtime)
+
+
+_config = None
+_config_failed_mtime = None  # mtime of a feeds.json that failed to load, to avoid retrying it
+_config_lock = threading.Lock()
+
+
+def load_feeds_config():
+    """Load feeds configuration
+
+    feeds.json is read and compiled once, then re-read only when its mtime
+    changes. If a changed file fails to load, the previous config is kept.
+
+    Returns:
+        FeedsConfig (EMPTY_CONFIG if feeds.json has never loaded successfully)
+    """
+    global _config, _config_failed_mtime
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError as e:
+        log("feeds.json not found at %s: %s", CONFIG_PATH, e, level=logging.ERROR)
+        return _config or EMPTY_CONFIG
+
+    config = _config
+    if config is not None and config.mtime == mtime:
+        return config
+    if mtime == _config_failed_mtime:
+        return config or EMPTY_CONFIG
+
+    with _config_lock:
+        if _config is not None and _config.mtime == mtime:
+            return _config
+        try:
+            log("Loading feeds.json configuration from %s", CONFIG_PATH)
+            with open(CONFIG_PATH, 'r') as f:
+                _config = compile_feeds_config(json.load(f), mtime)
+            log("Successfully loaded config with %s sections", len(_config.sections))
+        except Exception as e:
+            _config_failed_mtime = mtime
+            log("Error loading feeds.json: %s", e, level=logging.ERROR, exc_info=True)
+        return _config or EMPTY_CONFIG
+
+
+# Closing tag of one feed entry, optionally namespace-prefixed (e.g. </atom:entry>)
+_ENTRY_END_RE = re.compile(rb'</(?:[\w.-]+:)?(?:item|entry)\s*>', re.IGNORECASE)
+# Root element of the feed, used to re-close a truncated document
+_FEED_ROOT_RE = re.compile(rb'<(rss|feed|rdf:RDF)[\s>]')
+_FEED_ROOT_CLOSERS = {
+    b'rss': b'</channel></rss>',
+    b'feed': b'</feed>',
+    b'rdf:RDF': b'</rdf:RDF>',
+}
+
+
+def read_feed_body(response, max_items, max_bytes=None):
+    """Download a streamed feed body, stopping once max_items entries have arrived
+
+    The body is read in chunks and scanned for closing </item>/</entry> tags.
+    Reading stops after the max_items-th entry or at max_bytes, and the
+    document is re-closed after the last complete entry, so feedparser only
+    parses entries that will be used.
+
+    Args:
+        response: requests response opened with stream=True
+        max_items: Number of complete entries to read
+        max_bytes: Download cap in bytes (defaults to MAX_FEED_BYTES)
+
+    Returns:
+        Feed bytes, truncated and re-closed if reading stopped early
+
+    Raises:
+        ValueError if max_bytes is reached before a single complete entry
+    """
+    if max_bytes is None:
+        max_bytes = MAX_FEED_BYTES
+
+    body = bytearray()
+    count = 0
+    last_end = 0
+    cut = None
+    for chunk in response.iter_content(chunk_size=FEED_CHUNK_SIZE):
+        # Rescan a short tail so closing tags split across chunks are found
+        scan_from = max(last_end, len(body) - 32)
+        body += chunk
+        for match in _ENTRY_END_RE.finditer(body, scan_from):
+            count += 1
+            last_end = match.end()
+            if count >= max_items:
+                cut = last_end
+                break
+        if cut is not None:
+            break
+        if len(body) >= max_bytes:
+            if not last_end:
+                raise ValueError(f"Feed exceeds {max_bytes} bytes without a complete entry")
+            log("Feed body reached %s bytes after %s entries, truncating",
+                max_bytes, count, level=logging.DEBUG)
+            cut = last_end
+            break
+
+    if cut is None:
+        return bytes(body)
+
+    root = _FEED_ROOT_RE.search(body, 0, cut)
+    closer = _FEED_ROOT_CLOSERS.get(root.group(1), b'') if root else b''
+    log("Stopped reading feed after %s entries (%s bytes)", count, cut, level=logging.DEBUG)
+    return bytes(body[:cut]) + closer
+
+
+def stale_rss_result(url, error_msg):
+    """Last-known-good parse result for a feed, marked stale, or an error result"""
+    entry = FEED_CACHE.get(url)
+    data = entry.get('data') if entry else None
+    if data and data.get('items'):
+        log("Serving stale items for %s: %s", url, error_msg, level=logging.WARNING)
+        return dict(data, stale=True, error_msg=error_msg)
+    return {'items': [], 'error': True, 'error_msg': error_msg, 'total_count': 0}
+
+
+def fetch_rss_feed(url, limit=5, enable_load_more=True, name=None):
+    """Fetch and parse RSS feed
+
+    A cached response is reused without polling for at least the feed's
+    learned interval from FEED_POLLER. Feeds whose circuit breaker is open
+    are not contacted at all. When a
+    feed is skipped or its fetch fails, its last-known-good items are
+    returned with 'stale' set if there are any.
+
+    Args:
+        url: Feed URL
+        limit: Initial display limit
+        enable_load_more: If True, fetch up to MAX_FETCH_ITEMS for load-more; if False, only fetch limit
+        name: Feed name recorded with its items in the item store (defaults to the host)
+
+    Returns:
+        dict with 'items' (all items), 'error' flag, and 'total_count'
+    """
+    # Security: Validate URL before fetching
+    if not is_safe_url(url):
+        log("Skipping unsafe URL: %s", url, level=logging.WARNING)
+        return {'items': [], 'error': True, 'error_msg': 'Unsafe URL', 'total_count': 0}
+
+    if not FEED_BREAKERS.allow(url):
+        log("Circuit open for %s, skipping fetch", url, level=logging.DEBUG)
+        return stale_rss_result(url, 'Feed temporarily disabled after repeated failures')
+
+    started = time.monotonic()
+    try:
+        log("Fetching RSS feed: %s", url, level=logging.DEBUG)
+
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (compatible; PrawnFeeds/1.0; +http://localhost:3000)',
+            'Accept': 'application/rss+xml, application/xml, text/xml'
+        }
+
+        # Fetch more items if requested (for load-more feature)
+        max_items = MAX_FETCH_ITEMS if enable_load_more else limit
+
+        # Space out requests that share a site; distinct sites go out at once
+        result = cached_request(
+            url, 'rss',
+            functools.partial(parse_rss_body, max_items=max_items),
+            headers=headers, polite=True, parse_in_pool=True,
+            read_body=lambda response: read_feed_body(response, max_items),
+            min_ttl=FEED_POLLER.interval(url),
+            on_outcome=observe_feed_poll('rss', url, name or urlparse(url).hostname))
+
+        FEED_BREAKERS.record(url, time.monotonic() - started,
+                             result['error_msg'] if result['error'] else None)
+        log("Returning %s items from %s", len(result['items']), url, level=logging.DEBUG)
+        return result
+    except Exception as e:
+        error_msg = str(e)
+        FEED_BREAKERS.record(url, time.monotonic() - started, error_msg)
+        log("Error fetching %s: %s", url, error_msg, level=logging.ERROR, exc_info=True)
+        return stale_rss_result(url, error_msg)
+
+
+def get_time_ago(timestamp, now=None):
+    """Convert UTC epoch seconds to relative time, or '' if unknown"""
+    if timestamp is None:
+        return ''
+    seconds = (time.time() if now is None else now) - timestamp
+
+    if seconds < 60:
+        return 'just now'
+    elif seconds < 3600:
+        return f'{int(seconds / 60)}m ago'
+    elif seconds < 86400:
+        return f'{int(seconds / 3600)}h ago'
+    elif seconds < 604800:
+        return f'{int(seconds / 86400)}d ago'
+    else:
+        return f'{int(seconds / 604800)}w ago'
+
+
+def add_time_labels(items, now):
+    """Return copies of items with a relative 'published' label from 'published_ts'"""
+    return [dict(item, published=get_time_ago(item.get('published_ts'), now)) for item in items]
+
+
+def label_time():
+    """The current time floored to the minute, to label items with
+
+    Relative labels only change by the minute, so every page rendered in the
+    same minute, streamed or not, gets identical widget HTML and fragments.
+    """
+    return time.time() // 60 * 60
+
+
+# Realistic browser-like User-Agent
+REDDIT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
+}
+
+
+def retry_after_seconds(response):
+    """Parse a response's Retry-After header into seconds, or None"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    retry_at = parse_timestamp(value)
+    return max(retry_at - time.time(), 0) if retry_at else None
+
+
+def cached_reddit_data(url, default):
+    """Last parse result cached for a www.reddit.com URL, used while backing off"""
+    entry = FEED_CACHE.get(url)
+    data = entry.get('data') if entry else None
+    return default if data is None else data
+
+
+def back_off_reddit(error):
+    """Hold off every www.reddit.com request after a failure worth retrying later
+
+    Rate limiting (honouring Retry-After), server errors and network errors
+    start or extend REDDIT_BACKOFF; other errors leave it alone.
+    """
+    import requests
+
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        if response.status_code != 429 and response.status_code < 500:
+            return
+        delay = REDDIT_BACKOFF.failure(retry_after_seconds(response))
+    elif isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        delay = REDDIT_BACKOFF.failure()
+    else:
+        return
+    log("Backing off Reddit for %.0fs", delay, level=logging.WARNING)
+
+
+def fetch_reddit_rss(subreddit, limit=5):
+    """Fetch a subreddit's posts from its RSS feed
+
+    While REDDIT_BACKOFF is holding Reddit off, the last cached posts are
+    returned without a request.
+    """
+    import requests
+
+    rss_url = f'https://www.reddit.com/r/{subreddit}/.rss'
+    delay = REDDIT_BACKOFF.remaining()
+    if delay > 0:
+        log("Reddit backing off for another %.0fs, skipping RSS for r/%s",
+            delay, subreddit, level=logging.WARNING)
+        return cached_reddit_data(rss_url, [])
+
+    log("Trying RSS fallback for r/%s: %s", subreddit, rss_url)
+
+    try:
+        posts = cached_request(
+            rss_url, 'reddit',
+            functools.partial(parse_reddit_rss_body, limit=limit),
+            headers=REDDIT_HEADERS, parse_in_pool=True,
+            on_outcome=lambda outcome, posts: store_reddit_listing(outcome, {subreddit: posts}))
+        REDDIT_BACKOFF.success()
+        log("Returning %s posts from r/%s via RSS", len(posts), subreddit, level=logging.DEBUG)
+        return posts
+
+    except requests.exceptions.HTTPError as e:
+        response = e.response
+        response_preview = response.text[:500] if response.text else ''
+        log("Reddit RSS non-200 status for r/%s: HTTP %s, response: %s",
+            subreddit, response.status_code, response_preview, level=logging.WARNING)
+        back_off_reddit(e)
+        return []
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        log("Reddit RSS failed for r/%s: %s: %s",
+            subreddit, type(e).__name__, e, level=logging.WARNING)
+        back_off_reddit(e)
+        return []
+    except Exception as e:
+        log("Reddit RSS fallback error for r/%s: %s: %s",
+            subreddit, type(e).__name__, e, level=logging.ERROR, exc_info=True)
+        return []
+
+
+def store_reddit_listing(outcome, listing):
+    """on_outcome callback recording a freshly parsed combined listing in the item store"""
+    if outcome == 'fetched':
+        for subreddit, posts in listing.items():
+            store_items('reddit', f'r/{subreddit}', posts)
+
+
+def fetch_reddit(subreddits, limit=5):
+    """Fetch Reddit posts for several subreddits with one combined request
+
+    Every subreddit is read from a single r/a+b+c/top.json listing and split
+    back out per subreddit. A 429, 5xx or network error backs off all Reddit
+    requests through REDDIT_BACKOFF, honouring Retry-After, instead of
+    sleeping in the worker; the retry happens on a later refresh once the
+    backoff has expired, and the last cached listing is used meanwhile.
+    Subreddits left without posts are up to the caller to fetch with
+    fetch_reddit_rss(), as separate jobs.
+
+    Returns:
+        List of post lists in the same order as subreddits
+    """
+    import requests
+
+    if not subreddits:
+        return []
+
+    combined = '+'.join(subreddits)
+    log("Fetching Reddit: r/%s", combined, level=logging.DEBUG)
+
+    json_url = (f'https://www.reddit.com/r/{combined}/top.json'
+                f'?limit={REDDIT_LISTING_LIMIT}&t=day')
+    listing = {}
+    delay = REDDIT_BACKOFF.remaining()
+    if delay > 0:
+        log("Reddit backing off for another %.0fs, using the cached listing",
+            delay, level=logging.WARNING)
+        listing = cached_reddit_data(json_url, {})
+    else:
+        try:
+            listing = cached_request(
+                json_url, 'reddit',
+                lambda body: parse_reddit_listing(json.loads(body), subreddits, limit),
+                headers=REDDIT_HEADERS, on_outcome=store_reddit_listing)
+            REDDIT_BACKOFF.success()
+
+        except requests.exceptions.HTTPError as e:
+            response = e.response
+            response_preview = response.text[:500] if response.text else ''
+            log("Reddit JSON non-200 status for r/%s: HTTP %s, response: %s",
+                combined, response.status_code, response_preview, level=logging.WARNING)
+            back_off_reddit(e)
+
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            log("Reddit JSON failed for r/%s: %s: %s",
+                combined, type(e).__name__, e, level=logging.WARNING)
+            back_off_reddit(e)
+        except Exception as e:
+            log("Reddit JSON error for r/%s: %s: %s",
+                combined, type(e).__name__, e, level=logging.ERROR, exc_info=True)
+
+    results = [listing.get(subreddit.lower()) or [] for subreddit in subreddits]
+    log("Returning %s posts from %s subreddits",
+        sum(len(posts) for posts in results), len(subreddits), level=logging.DEBUG)
+    return results
+
+
+def fetch_youtube(channel_id, channel_name, limit=3):
+    """Fetch YouTube channel videos via RSS feed with thumbnail support"""
+    try:
+        log("Fetching YouTube: %s (%s)", channel_name, channel_id, level=logging.DEBUG)
+
+        url = f'https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}'
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (compatible; RSS Reader/1.0)',
+            'Accept': 'application/xml, text/xml'
+        }
+        videos = cached_request(
+            url, 'youtube',
+            functools.partial(parse_youtube_body, limit=limit),
+            headers=headers, parse_in_pool=True,
+            read_body=lambda response: read_feed_body(response, limit),
+            min_ttl=FEED_POLLER.interval(url),
+            on_outcome=observe_feed_poll('youtube', url, channel_name))
+
+        log("Returning %s videos from %s", len(videos), channel_name, level=logging.DEBUG)
+        return videos
+    except Exception as e:
+        log("Error fetching YouTube %s: %s", channel_name, e, level=logging.ERROR, exc_info=True)
+        return []
+
+
+# Public Client-ID used by Twitch web (same method as Glance)
+TWITCH_GQL_URL = 'https://gql.twitch.tv/gql'
+TWITCH_HEADERS = {
+    'Client-ID': 'kimne78kx3ncx6brgo4mv6wki5h1ko',
+    'Content-Type': 'application/json',
+}
+TWITCH_USER_FRAGMENT = """
+fragment StreamInfo on User {
+    displayName
+    login
+    stream {
+        title
+        viewersCount
+        game {
+            name
+        }
+    }
+}
+"""
+
+
+def parse_twitch_user(user_data, channel_name):
+    """Convert a GraphQL user object into the Twitch status dict"""
+    if not user_data:
+        log("Twitch user not found: %s", channel_name)
+        return {
+            'name': channel_name,
+            'display_name': channel_name,
+            'is_live': False,
+            'game': '',
+            'viewers': 0,
+            'title': ''
+        }
+
+    stream = user_data.get('stream')
+    if stream:
+        game = stream.get('game', {}) or {}
+        return {
+            'name': user_data.get('login', channel_name),
+            'display_name': user_data.get('displayName', channel_name),
+            'is_live': True,
+            'game': game.get('name', ''),
+            'viewers': stream.get('viewersCount', 0),
+            'title': stream.get('title', '')[:100]
+        }
+    return {
+        'name': user_data.get('login', channel_name),
+        'display_name': user_data.get('displayName', channel_name),
+        'is_live': False,
+        'game': '',
+        'viewers': 0,
+        'title': ''
+    }
+
+
+def twitch_error_status(channel_name):
+    """Status dict shown for a channel whose lookup failed"""
+    return {
+        'name': channel_name,
+        'display_name': channel_name,
+        'is_live': False,
+        'game': '',
+        'viewers': 0,
+        'title': '',
+        'error': True
+    }
+
+
+def parse_twitch_batch(payload, channel_names):
+    """Split a batched GraphQL response into per-channel status dicts
+
+    Channel i is looked up as alias u{i}. Entries are None for channels
+    whose field is missing or reported in the response's errors, so the
+    caller can retry them.
+    """
+    data = payload.get('data') or {}
+    failed = {str(error['path'][0]) for error in payload.get('errors') or []
+              if error.get('path')}
+
+    statuses = []
+    for idx, channel_name in enumerate(channel_names):
+        alias = f'u{idx}'
+        if alias in failed or alias not in data:
+            statuses.append(None)
+        else:
+            statuses.append(parse_twitch_user(data[alias], channel_name))
+    return statuses
+
+
+def request_twitch_batch(channel_names, revalidate=False):
+    """Look up channels as aliased user fields of one GraphQL POST
+
+    Returns:
+        List of status dicts, or None for channels the response missed
+    """
+    params = ', '.join(f'$l{idx}: String!' for idx in range(len(channel_names)))
+    fields = '\n'.join(f'u{idx}: user(login: $l{idx}) {{ ...StreamInfo }}'
+                       for idx in range(len(channel_names)))
+    payload = {
+        'query': f'query GetStreamInfoBatch({params}) {{\n{fields}\n}}\n' + TWITCH_USER_FRAGMENT,
+        'variables': {f'l{idx}': channel.lower() for idx, channel in enumerate(channel_names)}
+    }
+    return cached_request(
+        TWITCH_GQL_URL, 'twitch',
+        lambda body: parse_twitch_batch(json.loads(body), channel_names),
+        headers=TWITCH_HEADERS, method='POST', json_body=payload, timeout=5,
+        ttl=TWITCH_TTL, revalidate=revalidate)
+
+
+def fetch_twitch_statuses(channel_names, resolved=None):
+    """Fetch Twitch live status for many channels in as few requests as possible
+
+    Up to TWITCH_BATCH_SIZE logins are resolved per POST. Channels a batch
+    could not resolve are looked up again together in one more batched
+    request; channels still missing after that, and every channel of a
+    failed request, get error statuses.
+
+    Args:
+        channel_names: Twitch logins to look up
+        resolved: Optional dict filled with position -> status as each batch
+            completes, so a caller that gives up early keeps what resolved
+
+    Returns:
+        List of status dicts in the same order as channel_names
+    """
+    resolved = {} if resolved is None else resolved
+    for start in range(0, len(channel_names), TWITCH_BATCH_SIZE):
+        pending = list(range(start, min(start + TWITCH_BATCH_SIZE, len(channel_names))))
+        for attempt in range(2):
+            chunk = [channel_names[position] for position in pending]
+            log("Fetching Twitch status for %s channels", len(chunk), level=logging.DEBUG)
+            try:
+                # A retry of the same logins must not get the cached partial answer
+                results = request_twitch_batch(chunk, revalidate=attempt > 0)
+            except Exception as e:
+                log("Error fetching Twitch batch %s: %s", chunk, e, level=logging.ERROR)
+                break
+            for position, status in zip(pending, results):
+                if status is not None:
+                    resolved[position] = status
+            pending = [position for position in pending if position not in resolved]
+            if not pending:
+                break
+            log("Twitch batch missed %s", [channel_names[position] for position in pending],
+                level=logging.WARNING)
+        for position in pending:
+            resolved[position] = twitch_error_status(channel_names[position])
+    return [resolved[position] for position in range(len(channel_names))]
 
-# Enable debug logging
-app.config['DEBUG'] = True
 
-# Parallel fetching configuration
-PARALLEL_TIMEOUT = 10  # Overall timeout for parallel operations in seconds
-RSS_MAX_WORKERS = 15  # Max concurrent RSS feed fetches
-REDDIT_MAX_WORKERS = 6  # Max concurrent Reddit fetches
-YOUTUBE_MAX_WORKERS = 10  # Max concurrent YouTube fetches
-TWITCH_MAX_WORKERS = 5  # Max concurrent Twitch status checks
+class FetchBatch:
+    """Fetch jobs running concurrently on the shared pool under one deadline
 
-# Feed fetching configuration
-MAX_FETCH_ITEMS = 25  # Maximum items to fetch per feed for load-more support
+    Jobs start as soon as the batch is created. Outcomes can be collected in
+    any order; each wait is bounded by the time left until the batch deadline.
+    """
 
+    def __init__(self, jobs, deadline=None):
+        """
+        Args:
+            jobs: List of (fn, args) tuples
+            deadline: Seconds allowed for the whole batch (defaults to FETCH_DEADLINE)
+        """
+        self.jobs = jobs
+        self.deadline_at = time.monotonic() + (FETCH_DEADLINE if deadline is None else deadline)
+        self.futures = [FETCH_EXECUTOR.submit(self._run, time.perf_counter(), fn, args)
+                        for fn, args in jobs]
+        self._lock = threading.Lock()
+
+    def add(self, fn, args):
+        """Start one more job under the batch deadline and return its index"""
+        with self._lock:
+            self.jobs.append((fn, args))
+            self.futures.append(FETCH_EXECUTOR.submit(self._run, time.perf_counter(), fn, args))
+            return len(self.futures) - 1
+
+    @staticmethod
+    def _run(submitted_at, fn, args):
+        METRICS.observe('prawnfeeds_fetch_queue_wait_seconds',
+                        time.perf_counter() - submitted_at, job=fn.__name__)
+        return fn(*args)
+
+    def outcome(self, idx):
+        """Wait for one job and return (result, error_msg)
+
+        error_msg is None on success and 'Timeout' if the job was still
+        pending at the batch deadline.
+        """
+        future = self.futures[idx]
+        try:
+            return future.result(timeout=max(self.deadline_at - time.monotonic(), 0)), None
+        except FuturesTimeoutError:
+            # Drop the job if still queued; a running one finishes in the background
+            future.cancel()
+            fn, args = self.jobs[idx]
+            METRICS.inc('prawnfeeds_fetch_timeouts_total', job=fn.__name__)
+            log("Fetch job %s%s timed out", fn.__name__, args, level=logging.WARNING)
+            return None, 'Timeout'
+        except Exception as e:
+            fn, args = self.jobs[idx]
+            log("Error in fetch job %s%s: %s", fn.__name__, args, e, level=logging.ERROR)
+            return None, str(e)
 
-def log(message):
-    """Helper function for logging"""
-    print(f"[LOG] {message}", file=sys.stderr, flush=True)
 
+class ResolvingList:
+    """Read-only list whose items are produced as their fetches complete
 
-# Security: Allowed schemes and blocked hosts for SSRF protection
-ALLOWED_SCHEMES = {'http', 'https'}
-BLOCKED_HOSTS = {'localhost', 'localhost.localdomain',
-                 '127.0.0.1', '0.0.0.0', '0', '169.254.169.254', '::1'}
+    Iterating yields items in order, waiting on each underlying fetch only
+    when it is reached, so a streaming template can flush earlier blocks
+    while later ones are still loading. Resolvers returning None are
+    skipped. If sort_key is given, every item is resolved before the first
+    one is yielded.
+    """
 
+    _UNRESOLVED = object()
+
+    def __init__(self, resolvers, sort_key=None):
+        self._resolvers = resolvers
+        self._sort_key = sort_key
+        self._values = [self._UNRESOLVED] * len(resolvers)
+        self._lock = threading.Lock()
+
+    def _resolve(self, idx):
+        with self._lock:
+            if self._values[idx] is self._UNRESOLVED:
+                self._values[idx] = self._resolvers[idx]()
+            return self._values[idx]
+
+    def __iter__(self):
+        if self._sort_key is not None:
+            yield from sorted(self.resolve_all(), key=self._sort_key)
+            return
+        for idx in range(len(self._resolvers)):
+            value = self._resolve(idx)
+            if value is not None:
+                yield value
+
+    def __len__(self):
+        return len(self.resolve_all())
+
+    def mapped(self, fn):
+        """Return a ResolvingList that applies fn to each item as it resolves"""
+        return ResolvingList(
+            [lambda idx=idx: self._map_value(fn, self._resolve(idx))
+             for idx in range(len(self._resolvers))],
+            sort_key=self._sort_key)
+
+    @staticmethod
+    def _map_value(fn, value):
+        return None if value is None else fn(value)
+
+    def resolve_all(self):
+        """Wait for every item and return them as a plain list"""
+        values = [self._resolve(idx) for idx in range(len(self._resolvers))]
+        values = [value for value in values if value is not None]
+        if self._sort_key is not None:
+            values.sort(key=self._sort_key)
+        return values
+
+
+class RedditFallbacks:
+    """RSS fallback jobs for subreddits the combined Reddit listing missed
+
+    The fallbacks are added to the batch from the listing job's done
+    callback, so they start as soon as the listing is in and no pool worker
+    ever waits on another job.
+    """
 
-def is_safe_url(url):
-    """Validate URL to prevent SSRF attacks"""
-    try:
-        parsed = urlparse(url)
-        # Check scheme
-        if parsed.scheme.lower() not in ALLOWED_SCHEMES:
-            log(f"Blocked URL with invalid scheme: {url}")
-            return False
-        # Check for blocked hostnames
-        hostname = parsed.hostname
-        if hostname is None:
-            log(f"Blocked URL with missing hostname: {url}")
-            return False
-        if hostname.lower() in BLOCKED_HOSTS:
-            log(f"Blocked URL with forbidden host: {url}")
-            return False
-        # Check for private/internal IP addresses
-        try:
-            ip = ipaddress.ip_address(hostname)
-            if ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved:
-                log(f"Blocked URL with private/internal IP: {url}")
-                return False
-        except ValueError:
-            pass  # Not an IP address, hostname is fine
-        return True
-    except Exception as e:
-        log(f"Error validating URL {url}: {e}")
-        return False
+    def __init__(self, batch, listing_idx, subreddits, limit):
+        self.batch = batch
+        self.listing_idx = listing_idx
+        self.subreddits = subreddits
+        self.limit = limit
+        self._jobs = None
+        self._lock = threading.Lock()
+        batch.futures[listing_idx].add_done_callback(self._listing_done)
+
+    def _listing_done(self, future):
+        if future.cancelled() or future.exception() is not None:
+            self.schedule(None)
+        else:
+            self.schedule(future.result())
 
+    def schedule(self, results):
+        """Add a fallback job for every subreddit without listing posts, once
 
-def load_feeds_config():
-    """Load feeds configuration"""
-    try:
-        log("Loading feeds.json configuration")
-        config_path = os.path.join(os.path.dirname(__file__), 'feeds.json')
-        log(f"Config path: {config_path}")
-        log(f"Current directory: {os.getcwd()}")
-        log(f"Directory contents: {os.listdir(os.path.dirname(__file__) or '.')}")
-
-        if not os.path.exists(config_path):
-            log(f"ERROR: feeds.json not found at {config_path}")
-            return {"sections": [], "subreddits": []}
-
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-            log(
-                f"Successfully loaded config with {len(config.get('sections', []))} sections")
-            return config
-    except Exception as e:
-        log(f"ERROR loading feeds.json: {e}")
-        log(traceback.format_exc())
-        return {"sections": [], "subreddits": []}
+        Returns:
+            Dict of subreddit position -> fallback job index
+        """
+        with self._lock:
+            if self._jobs is None:
+                self._jobs = {}
+                # Jobs added after the deadline could only time out
+                if time.monotonic() < self.batch.deadline_at:
+                    for position, subreddit in enumerate(self.subreddits):
+                        if not (results and results[position]):
+                            self._jobs[position] = self.batch.add(
+                                fetch_reddit_rss, (subreddit, self.limit))
+            return self._jobs
+
+    def posts(self, position):
+        """Posts of one subreddit, from the listing or else its fallback job"""
+        results, _ = self.batch.outcome(self.listing_idx)
+        jobs = self.schedule(results)
+        if position in jobs:
+            return self.batch.outcome(jobs[position])[0]
+        return results[position] if results else None
+
+
+def _route_rss(feed, outcome):
+    """Build the per-request view of a feed from its descriptor and fetch outcome"""
+    result, error_msg = outcome
+    if error_msg is not None:
+        result = {'items': [], 'error': True,
+                  'error_msg': error_msg, 'total_count': 0}
+    return {
+        'id': feed.id,
+        'name': feed.name,
+        'url': feed.url,
+        'initial_limit': feed.limit,
+        'all_items': result['items'],
+        'items': result['items'][:feed.limit],
+        'error': result['error'],
+        'error_msg': result['error_msg'],
+        'total_count': result['total_count'],
+        'stale': result.get('stale', False)
+    }
 
 
-def fetch_rss_feed(url, limit=5, enable_load_more=True):
-    """Fetch and parse RSS feed
+def _route_reddit(subreddit, posts):
+    """Build a subreddit block, or None if it has no posts"""
+    if not posts:
+        return None
+    return {
+        'name': f'r/{subreddit}',
+        'posts': posts
+    }
 
-    Args:
-        url: Feed URL
-        limit: Initial display limit
-        enable_load_more: If True, fetch up to MAX_FETCH_ITEMS for load-more; if False, only fetch limit
 
-    Returns:
-        dict with 'items' (all items), 'error' flag, and 'total_count'
-    """
-    # Security: Validate URL before fetching
-    if not is_safe_url(url):
-        log(f"Skipping unsafe URL: {url}")
-        return {'items': [], 'error': True, 'error_msg': 'Unsafe URL', 'total_count': 0}
+def _route_youtube(channel, outcome):
+    """Build a YouTube channel block"""
+    videos = outcome[0] or []
+    return {
+        'name': channel.name,
+        'category': channel.category,
+        'videos': videos,
+        'error': len(videos) == 0
+    }
 
-    try:
-        # Add random jitter to prevent thundering herd
-        time.sleep(random.uniform(0.5, 1.5))
 
-        log(f"Fetching RSS feed: {url}")
-        import feedparser
-        import requests
-        from datetime import datetime
-        from dateutil import parser as date_parser
+def _route_twitch(channel, outcome, position, resolved):
+    """Pick one channel's status out of the batched Twitch outcome"""
+    statuses, error_msg = outcome
+    if error_msg is not None:
+        # Keep the channels whose batch resolved before the job timed out
+        return resolved.get(position) or twitch_error_status(channel)
+    return statuses[position]
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; PrawnFeeds/1.0; +http://localhost:3000)',
-            'Accept': 'application/rss+xml, application/xml, text/xml'
-        }
 
-        # Check cache for conditional headers
-        cached = FEED_CACHE.get(url)
-        if cached:
-            if cached.get('etag'):
-                headers['If-None-Match'] = cached['etag']
-            if cached.get('last_modified'):
-                headers['If-Modified-Since'] = cached['last_modified']
+def _twitch_sort_key(status):
+    # Live channels first, then offline, each alphabetically
+    return (not status.get('is_live', False), status.get('display_name', '').lower())
+
 
-        response = requests.get(url, headers=headers, timeout=10)
+def start_snapshot_build():
+    """Start fetching every configured source and return a lazy snapshot
 
-        # Handle 304 Not Modified
-        if response.status_code == 304 and cached:
-            log(f"Hit existing cache for {url} (304)")
-            return cached['data']
+    All RSS, Reddit, YouTube and Twitch fetches are fanned out at once on the
+    shared pool and bounded by a single FETCH_DEADLINE. The returned
+    snapshot has the same shape as a built one, but its feed lists, and the
+    reddit_data, youtube_data and twitch_data entries, are ResolvingLists
+    that fill in as fetches complete. Pass it to materialize_snapshot() to
+    wait for everything.
 
-        response.raise_for_status()
-        log(f"RSS fetch successful: {url} (status: {response.status_code})")
+    The shared config descriptors are never modified; per-request results
+    live in the snapshot's own 'sections' views and data lists.
+    """
+    # Workers warm up while the first fetches are still downloading
+    PARSE_POOL.start()
+    config = load_feeds_config()
+    sections = config.sections
+    subreddits = config.subreddits
+    youtube_channels = config.youtube_channels
+    twitch_channels = config.twitch_channels
+
+    # Each job is (route, target, fn, args); route turns the job's outcome
+    # into the structure the template expects
+    jobs = []
+    section_jobs = []
+    for section in sections:
+        first_job = len(jobs)
+        for feed in section.feeds:
+            jobs.append((_route_rss, feed, fetch_rss_feed,
+                         (feed.url, feed.limit, True, feed.name)))
+        section_jobs.append(range(first_job, len(jobs)))
+    # All subreddits share one combined Reddit job
+    first_reddit = len(jobs)
+    if subreddits:
+        jobs.append((None, None, fetch_reddit, (subreddits, 5)))
+    first_youtube = len(jobs)
+    for channel in youtube_channels:
+        jobs.append((_route_youtube, channel, fetch_youtube,
+                     (channel.channel_id, channel.name, channel.limit)))
+    # Every Twitch channel is looked up by one batched job
+    first_twitch = len(jobs)
+    twitch_resolved = {}
+    if twitch_channels:
+        jobs.append((None, None, fetch_twitch_statuses, (twitch_channels, twitch_resolved)))
+
+    log("Fetching %s jobs (%s sections, %s subreddits, %s YouTube channels, %s Twitch channels)",
+        len(jobs), len(sections), len(subreddits), len(youtube_channels), len(twitch_channels))
+
+    batch = FetchBatch([(fn, args) for _, _, fn, args in jobs])
+    reddit = RedditFallbacks(batch, first_reddit, subreddits, 5) if subreddits else None
+
+    def resolvers(indices):
+        return [
+            lambda idx=idx: jobs[idx][0](jobs[idx][1], batch.outcome(idx))
+            for idx in indices
+        ]
+
+    return {
+        'config': config,
+        'sections': [
+            {'title': section.title, 'feeds': ResolvingList(resolvers(indices))}
+            for section, indices in zip(sections, section_jobs)
+        ],
+        'reddit_data': ResolvingList(
+            [lambda position=position, subreddit=subreddit:
+                _route_reddit(subreddit, reddit.posts(position))
+             for position, subreddit in enumerate(subreddits)]),
+        'youtube_data': ResolvingList(resolvers(range(first_youtube, first_twitch))),
+        'twitch_data': ResolvingList(
+            [lambda position=position, channel=channel:
+                _route_twitch(channel, batch.outcome(first_twitch), position, twitch_resolved)
+             for position, channel in enumerate(twitch_channels)],
+            sort_key=_twitch_sort_key),
+        'started_at': time.time()
+    }
 
-        feed = feedparser.parse(response.content)
-        log(f"Parsed {len(feed.entries)} entries from {url}")
 
-        # Fetch more items if requested (for load-more feature)
-        max_items = MAX_FETCH_ITEMS if enable_load_more else limit
-        items = []
-        for entry in feed.entries[:max_items]:
-            published = entry.get('published', entry.get('updated', ''))
-            try:
-                if published:
-                    dt = date_parser.parse(published)
-                    time_ago = get_time_ago(dt)
-                else:
-                    time_ago = ''
-            except Exception as e:
-                log(f"Error parsing date: {e}")
-                time_ago = ''
-
-            # Extract thumbnail from various sources
-            thumbnail = ''
-
-            # Try media:thumbnail
-            if hasattr(entry, 'media_thumbnail') and entry.media_thumbnail and len(entry.media_thumbnail) > 0:
-                thumbnail = entry.media_thumbnail[0].get('url', '')
-
-            # Try media:content
-            elif hasattr(entry, 'media_content') and entry.media_content and len(entry.media_content) > 0:
-                media = entry.media_content[0]
-                # Check if it's an image
-                if media.get('medium') == 'image' or 'image' in media.get('type', ''):
-                    thumbnail = media.get('url', '')
-
-            # Try enclosures (common in podcasts and some feeds)
-            if not thumbnail and hasattr(entry, 'enclosures') and entry.enclosures:
-                for enclosure in entry.enclosures:
-                    if enclosure.get('type', '').startswith('image/'):
-                        thumbnail = enclosure.get('href', '')
-                        break
-
-            items.append({
-                'title': entry.get('title', 'No title')[:150],
-                'link': entry.get('link', '#'),
-                'published': time_ago,
-                'thumbnail': thumbnail
-            })
+def materialize_snapshot(lazy):
+    """Wait for every fetch of a lazy snapshot and return a plain snapshot
+
+    Returns:
+        dict with the FeedsConfig it was built from ('config'), the template
+        context ('sections', 'reddit_data', 'youtube_data', 'twitch_data'),
+        'built_at' (epoch seconds) and a content hash 'version'
+    """
+    snapshot = {
+        'config': lazy['config'],
+        'sections': [
+            {'title': section['title'], 'feeds': section['feeds'].resolve_all()}
+            for section in lazy['sections']
+        ],
+        'reddit_data': lazy['reddit_data'].resolve_all(),
+        'youtube_data': lazy['youtube_data'].resolve_all(),
+        'twitch_data': lazy['twitch_data'].resolve_all(),
+        'built_at': time.time()
+    }
+    snapshot['version'] = snapshot_version(snapshot)
+    METRICS.observe('prawnfeeds_snapshot_build_seconds',
+                    snapshot['built_at'] - lazy['started_at'])
+    log("Snapshot built in %.2fs", snapshot['built_at'] - lazy['started_at'])
+    return snapshot
 
-        if hasattr(feed, 'feed') and hasattr(feed.feed, 'link'):
-            site_url = feed.feed.link
 
-        result = {
-            'items': items,
-            'error': False,
-            'error_msg': '',
-            'total_count': len(items),
-            'site_url': site_url
-        }
+def snapshot_version(snapshot):
+    """Hash of a snapshot's rendered data, identical across rebuilds and workers
+    when nothing upstream has changed"""
+    payload = json.dumps([snapshot['sections'], snapshot['reddit_data'],
+                          snapshot['youtube_data'], snapshot['twitch_data']],
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
 
-        # Update cache
-        FEED_CACHE[url] = {
-            'etag': response.headers.get('ETag'),
-            'last_modified': response.headers.get('Last-Modified'),
-            'data': result
-        }
 
-        log(f"Returning {len(items)} items from {url}")
-        return result
-    except Exception as e:
-        error_msg = str(e)
-        log(f"ERROR fetching {url}: {error_msg}")
-        log(traceback.format_exc())
-        return {'items': [], 'error': True, 'error_msg': error_msg, 'total_count': 0}
+def build_snapshot():
+    """Fetch every configured source and return an aggregate snapshot"""
+    return materialize_snapshot(start_snapshot_build())
 
 
-def get_time_ago(dt):
-    """Convert datetime to relative time"""
+# Latest aggregate snapshot served by the root route
+SNAPSHOT = None
+# The snapshot build in flight, shared by every request that needs it
+SNAPSHOT_FLIGHT = SingleFlight('snapshot', FETCH_DEADLINE)
+_refresher_lock = threading.Lock()
+_refresher_started = False
+
+
+def refresh_snapshot(wait=False):
+    """Rebuild the aggregate snapshot
+
+    Args:
+        wait: If True, join a build already in flight and reuse its result;
+            if False, return immediately when a build is in flight
+
+    Returns:
+        The current snapshot (may be None if no build has succeeded yet)
+    """
+    global SNAPSHOT
+    if not wait and SNAPSHOT_FLIGHT.in_flight('snapshot'):
+        log("Snapshot refresh already in flight, skipping", level=logging.DEBUG)
+        return SNAPSHOT
+    future, leader = SNAPSHOT_FLIGHT.claim('snapshot')
+    if not leader:
+        try:
+            return SNAPSHOT_FLIGHT.wait(future)
+        except Exception:
+            # The leader has already logged why its build failed; a timed
+            # out wait serves the stale snapshot, if there is one
+            return SNAPSHOT
     try:
-        from datetime import datetime
-        now = datetime.now(dt.tzinfo) if dt.tzinfo else datetime.now()
-        diff = now - dt
-        seconds = diff.total_seconds()
-
-        if seconds < 60:
-            return 'just now'
-        elif seconds < 3600:
-            return f'{int(seconds / 60)}m ago'
-        elif seconds < 86400:
-            return f'{int(seconds / 3600)}h ago'
-        elif seconds < 604800:
-            return f'{int(seconds / 86400)}d ago'
-        else:
-            return f'{int(seconds / 604800)}w ago'
+        SNAPSHOT = build_snapshot()
     except Exception as e:
-        log(f"ERROR calculating time ago: {e}")
-        return ''
+        log("Error refreshing snapshot: %s", e, level=logging.ERROR, exc_info=True)
+        SNAPSHOT_FLIGHT.resolve('snapshot', error=e)
+    else:
+        SNAPSHOT_FLIGHT.resolve('snapshot', SNAPSHOT)
+    return SNAPSHOT
 
 
-def fetch_reddit(subreddit, limit=5):
-    """Fetch Reddit posts with retry logic and RSS fallback"""
-    import requests
-    import time
-    import feedparser
+def revalidate_snapshot():
+    """Kick off a background snapshot rebuild without blocking the caller"""
+    if SNAPSHOT_FLIGHT.in_flight('snapshot'):
+        return
+    threading.Thread(target=refresh_snapshot,
+                     name='snapshot-revalidate', daemon=True).start()
 
-    # Realistic browser-like User-Agent
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
-    }
 
-    log(f"Fetching Reddit: r/{subreddit}")
+def _refresh_loop():
+    """Keep the snapshot warm by rebuilding it every REFRESH_INTERVAL seconds"""
+    while True:
+        refresh_snapshot()
+        time.sleep(REFRESH_INTERVAL)
 
-    # Try JSON endpoint first with retry logic
-    json_url = f'https://www.reddit.com/r/{subreddit}/top.json?limit={limit}&t=day'
-    max_retries = 3
 
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(json_url, headers=headers, timeout=10)
-
-            # Check for retryable status codes (429 or 5xx)
-            if response.status_code == 429 or response.status_code >= 500:
-                response_preview = response.text[:500] if response.text else ''
-                log(f"Reddit JSON attempt {attempt + 1}/{max_retries} failed for r/{subreddit}: "
-                    f"HTTP {response.status_code}, response: {response_preview}")
-                if attempt < max_retries - 1:
-                    # Exponential backoff: 1s, 2s, 4s, ...
-                    sleep_time = 2 ** attempt
-                    log(f"Retrying r/{subreddit} in {sleep_time}s...")
-                    time.sleep(sleep_time)
-                    continue
-                else:
-                    log(f"All {max_retries} JSON attempts failed for r/{subreddit}, trying RSS fallback")
-                    break
+def start_refresher():
+    """Start the background refresher thread once per process"""
+    global _refresher_started
+    if REFRESH_INTERVAL <= 0:
+        return
+    with _refresher_lock:
+        if _refresher_started:
+            return
+        _refresher_started = True
+    log("Starting background refresher (interval: %ss)", REFRESH_INTERVAL)
+    threading.Thread(target=_refresh_loop,
+                     name='snapshot-refresher', daemon=True).start()
 
-            # Log non-200 status codes with response preview
-            if response.status_code != 200:
-                response_preview = response.text[:500] if response.text else ''
-                log(f"Reddit JSON non-200 status for r/{subreddit}: "
-                    f"HTTP {response.status_code}, response: {response_preview}")
-                break
 
-            # Parse JSON response
-            data = response.json()
-            log(f"Reddit JSON fetch successful: r/{subreddit}")
-
-            posts = []
-            for post in data['data']['children'][:limit]:
-                p = post['data']
-
-                # Extract thumbnail
-                thumbnail = ''
-                if p.get('thumbnail') and p.get('thumbnail') not in ['self', 'default', 'nsfw', 'spoiler']:
-                    thumbnail = p.get('thumbnail')
-                elif p.get('preview') and p.get('preview', {}).get('images'):
-                    # Get the first preview image
-                    images = p['preview']['images']
-                    if images and len(images) > 0:
-                        image = images[0]
-                        if 'source' in image:
-                            thumbnail = image['source'].get(
-                                'url', '').replace('&amp;', '&')
-
-                posts.append({
-                    'title': p.get('title', '')[:150],
-                    'link': f"https://reddit.com{p.get('permalink', '')}",
-                    'score': p.get('score', 0),
-                    'comments': p.get('num_comments', 0),
-                    'thumbnail': thumbnail
-                })
-
-            log(f"Returning {len(posts)} posts from r/{subreddit}")
-            return posts
+_prebuilt_lock = threading.Lock()
+_prebuilt_checked = False
 
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-            log(f"Reddit JSON attempt {attempt + 1}/{max_retries} failed for r/{subreddit}: {type(e).__name__}: {e}")
-            if attempt < max_retries - 1:
-                # Exponential backoff: 1s, 2s, 4s, ...
-                sleep_time = 2 ** attempt
-                log(f"Retrying r/{subreddit} in {sleep_time}s...")
-                time.sleep(sleep_time)
-            else:
-                log(f"All {max_retries} JSON attempts failed for r/{subreddit}, trying RSS fallback")
-        except Exception as e:
-            log(f"Reddit JSON error for r/{subreddit}: {type(e).__name__}: {e}")
-            log(traceback.format_exc())
-            break
 
-    # RSS fallback
-    rss_url = f'https://www.reddit.com/r/{subreddit}/.rss'
-    log(f"Trying RSS fallback for r/{subreddit}: {rss_url}")
+def adopt_prebuilt_snapshot():
+    """Serve the snapshot saved by `python main.py build` if none is loaded yet
+
+    Checked once per process, so a cold start renders the baked snapshot
+    instead of fetching every source inside the first request. It is
+    revalidated in the background like any other snapshot older than
+    SNAPSHOT_TTL.
+    """
+    global SNAPSHOT, _prebuilt_checked
+    if _prebuilt_checked:
+        return
+    with _prebuilt_lock:
+        if _prebuilt_checked:
+            return
+        _prebuilt_checked = True
+        if not BUILD_DIR:
+            return
+        path = os.path.join(BUILD_DIR, 'snapshot.json')
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log("Ignoring unreadable prebuilt snapshot %s: %s", path, e, level=logging.WARNING)
+            return
+        snapshot['config'] = load_feeds_config()
+        # The build signed its /thumb URLs with its own key, which this host
+        # only shares if THUMB_SECRET is set
+        for item in _snapshot_items(snapshot):
+            source = thumbnail_source(item.get('thumbnail'))
+            if source:
+                item['thumbnail'] = proxied_thumbnail(source)
+        if SNAPSHOT is None:
+            SNAPSHOT = snapshot
+            log("Serving prebuilt snapshot from %s (%.0fs old)",
+                path, time.time() - snapshot['built_at'])
+
+
+def get_snapshot():
+    """Return the snapshot to render, serving stale data while revalidating
+
+    The first call in a process adopts the prebuilt snapshot if there is one
+    and otherwise builds the snapshot synchronously; after that the current
+    snapshot is returned immediately and a background rebuild is triggered
+    once it is older than SNAPSHOT_TTL.
+    """
+    start_refresher()
+    adopt_prebuilt_snapshot()
+    snapshot = SNAPSHOT
+    if snapshot is None:
+        log("No snapshot yet, building synchronously")
+        snapshot = refresh_snapshot(wait=True)
+        if snapshot is None:
+            raise RuntimeError("Failed to build feed snapshot")
+        return snapshot
+
+    age = time.time() - snapshot['built_at']
+    if age > SNAPSHOT_TTL:
+        log("Snapshot is %.0fs old, revalidating in background", age)
+        revalidate_snapshot()
+    return snapshot
+
+
+# Rendered HTML of each widget keyed by a content hash of its data
+FRAGMENT_CACHE = LRUCache(FRAGMENT_CACHE_MAX_ENTRIES, FRAGMENT_CACHE_MAX_BYTES)
+
+# Bodies whose strong ETag is unchanged are identical, so a page is rendered
+# and compressed once per snapshot version and minute rather than per request
+RESPONSE_CACHE = LRUCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+
+# Fragment kind -> macro in templates/_widgets.html
+FRAGMENT_MACROS = {
+    'feed': 'feed_widget',
+    'twitch': 'twitch_widget',
+    'youtube': 'youtube_widget',
+    'reddit': 'reddit_widget',
+}
+
+
+@app.template_global()
+def render_fragment(kind, data, *args):
+    """Render one widget, reusing the cached HTML when its data is unchanged
+
+    The cache key is a hash of the widget's data and of the templates, so
+    only blocks whose items changed since the last render are passed through
+    their macro again, and blocks reused from an earlier build's manifest are
+    dropped once a template changes.
+    """
+    payload = json.dumps([template_version(), data, args], sort_keys=True, default=str)
+    key = f"{kind}:{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}"
+    html = FRAGMENT_CACHE.get(key)
+    if html is None:
+        macro = get_template_attribute('_widgets.html', FRAGMENT_MACROS[kind])
+        html = str(macro(data, *args))
+        FRAGMENT_CACHE.set(key, html, len(html))
+    if 'fragments' in g:
+        # A static build records every block it used for the next build
+        g.fragments[key] = html
+    return Markup(html)
+
+
+# Content-Encoding -> file suffix of precompressed asset variants
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
 
+
+def _brotli():
+    """The brotli module, or None if it is not installed"""
     try:
-        response = requests.get(rss_url, headers=headers, timeout=10)
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def negotiate_encoding():
+    """Best Content-Encoding the client accepts: 'br', 'gzip' or None"""
+    accepted = request.accept_encodings
+    br, gzip = accepted.quality('br'), accepted.quality('gzip')
+    if br and br >= gzip and _brotli() is not None:
+        return 'br'
+    if gzip:
+        return 'gzip'
+    return None
+
+
+def compress_body(data, encoding, best=False):
+    """Compress bytes with gzip or brotli, at maximum effort if best is set"""
+    if encoding == 'br':
+        return _brotli().compress(data, quality=11 if best else BROTLI_QUALITY)
+    compressor = zlib.compressobj(9 if best else GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress a streamed body, flushing after every chunk so the client
+    still receives each widget as soon as it is rendered"""
+    if encoding == 'br':
+        compressor = _brotli().Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield data + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        yield data + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def matching_etag(etag):
+    """The tag in the client's If-None-Match that is etag in any encoding, or None"""
+    tags = request.if_none_match
+    for suffix in ('', '-br', '-gzip'):
+        if tags.contains_weak(etag + suffix):
+            return etag + suffix
+    return None
+
+
+def conditional_response(etag, build):
+    """Answer 304 if the client has etag, otherwise build the response
+
+    The ETag is checked before build() runs, so unchanged pages are never
+    rendered. Compressed variants get the encoding appended to the ETag by
+    finalize_response, and all of them match here.
+    """
+    matched = matching_etag(etag)
+    if matched is not None:
+        response = app.response_class(status=304)
+        response.set_etag(matched)
+        # Caches need the same Vary as on the 200 being revalidated
+        response.vary.add('Accept-Encoding')
+        return response
+    response = build()
+    response.set_etag(etag)
+    return response
 
-        if response.status_code != 200:
-            response_preview = response.text[:500] if response.text else ''
-            log(f"Reddit RSS non-200 status for r/{subreddit}: "
-                f"HTTP {response.status_code}, response: {response_preview}")
-            return []
 
-        feed = feedparser.parse(response.content)
-        log(
-            f"Reddit RSS fetch successful: r/{subreddit}, {len(feed.entries)} entries")
-
-        posts = []
-        for entry in feed.entries[:limit]:
-            # Try to extract thumbnail from media elements
-            thumbnail = ''
-            if hasattr(entry, 'media_thumbnail') and entry.media_thumbnail and len(entry.media_thumbnail) > 0:
-                thumbnail = entry.media_thumbnail[0].get('url', '')
-            elif hasattr(entry, 'media_content') and entry.media_content and len(entry.media_content) > 0:
-                media = entry.media_content[0]
-                if media.get('medium') == 'image' or 'image' in media.get('type', ''):
-                    thumbnail = media.get('url', '')
-
-            posts.append({
-                'title': entry.get('title', 'No title')[:150],
-                'link': entry.get('link', '#'),
-                'score': 0,  # RSS doesn't provide score
-                'comments': 0,  # RSS doesn't provide comment count
-                'thumbnail': thumbnail
-            })
+def compress_response(response):
+    """Compress a compressible 200 response for the negotiated encoding"""
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return
+        etag, weak = response.get_etag()
+        key = f"{request.full_path} {etag}-{encoding}" if etag and not weak else None
+        body = RESPONSE_CACHE.get(key) if key else None
+        if body is None:
+            body = compress_body(data, encoding)
+            if key:
+                RESPONSE_CACHE.set(key, body, len(body))
+        response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
 
-        log(f"Returning {len(posts)} posts from r/{subreddit} via RSS")
-        return posts
 
-    except Exception as e:
-        log(
-            f"Reddit RSS fallback error for r/{subreddit}: {type(e).__name__}: {e}")
-        log(traceback.format_exc())
-        return []
+@app.after_request
+def finalize_response(response):
+    """Apply the endpoint's cache policy and compress the body"""
+    if 'Cache-Control' not in response.headers:
+        if response.status_code >= 400:
+            response.headers['Cache-Control'] = ERROR_CACHE_POLICY
+        else:
+            response.headers['Cache-Control'] = CACHE_POLICIES.get(
+                request.endpoint, DEFAULT_CACHE_POLICY)
+    compress_response(response)
+    return response
 
 
-def fetch_youtube(channel_id, channel_name, limit=3):
-    """Fetch YouTube channel videos via RSS feed with thumbnail support"""
+def is_fresh_variant(path, variant):
+    """True if a precompressed variant exists and is not older than its original"""
     try:
-        log(f"Fetching YouTube: {channel_name} ({channel_id})")
-        import feedparser
-        import requests
-        from datetime import datetime
-        from dateutil import parser as date_parser
-        import re
+        return os.path.getmtime(variant) >= os.path.getmtime(path)
+    except OSError:
+        return False
 
-        url = f'https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; RSS Reader/1.0)',
-            'Accept': 'application/xml, text/xml'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        log(f"YouTube fetch successful: {channel_name}")
 
-        feed = feedparser.parse(response.content)
-        log(f"Parsed {len(feed.entries)} entries from YouTube channel {channel_name}")
+def serve_static(filename):
+    """Serve a file from the static folder, preferring a precompressed variant
 
-        videos = []
-        for entry in feed.entries[:limit]:
-            published = entry.get('published', entry.get('updated', ''))
-            try:
-                if published:
-                    dt = date_parser.parse(published)
-                    time_ago = get_time_ago(dt)
-                else:
-                    time_ago = ''
-            except Exception as e:
-                log(f"Error parsing date: {e}")
-                time_ago = ''
-
-            # Extract thumbnail from media:thumbnail or construct from video ID
-            thumbnail = ''
-            if hasattr(entry, 'media_thumbnail') and entry.media_thumbnail and len(entry.media_thumbnail) > 0:
-                thumbnail = entry.media_thumbnail[0].get('url', '')
-            elif hasattr(entry, 'media_content') and entry.media_content and len(entry.media_content) > 0:
-                thumbnail = entry.media_content[0].get('url', '')
-
-            # If no thumbnail found, try to extract video ID from link and construct thumbnail URL
-            if not thumbnail:
-                video_link = entry.get('link', '')
-                video_id_match = re.search(
-                    r'(?:v=|/videos/|/embed/|youtu\.be/)([a-zA-Z0-9_-]{11})', video_link)
-                if video_id_match:
-                    video_id = video_id_match.group(1)
-                    thumbnail = f'https://img.youtube.com/vi/{video_id}/mqdefault.jpg'
-                    log(f"Constructed thumbnail URL from video ID: {video_id}")
-
-            videos.append({
-                'title': entry.get('title', 'No title')[:150],
-                'link': entry.get('link', '#'),
-                'published': time_ago,
-                'thumbnail': thumbnail
-            })
+    Variants are written next to the asset by precompress_assets() and used
+    only while they are newer than the original.
+    """
+    from werkzeug.exceptions import NotFound
+    from werkzeug.security import safe_join
+
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    encoding = None
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if mimetype in COMPRESSIBLE_MIMETYPES:
+        encoding = negotiate_encoding()
+    variant = path + ENCODING_SUFFIXES[encoding] if encoding else None
+    if variant and is_fresh_variant(path, variant):
+        stat = os.stat(path)
+        response = send_file(variant, mimetype=mimetype, max_age=STATIC_MAX_AGE,
+                             etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}-{encoding}")
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(path, mimetype=mimetype, max_age=STATIC_MAX_AGE)
+    if mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add('Accept-Encoding')
+    return response
 
-        log(f"Returning {len(videos)} videos from {channel_name}")
-        return videos
-    except Exception as e:
-        log(f"ERROR fetching YouTube {channel_name}: {e}")
-        log(traceback.format_exc())
-        return []
 
+app.view_functions['static'] = serve_static
 
-def fetch_twitch_status(channel_name):
-    """Fetch Twitch live status using GraphQL API (no OAuth required)"""
-    try:
-        log(f"Fetching Twitch status: {channel_name}")
-        import requests
-
-        # Public Client-ID used by Twitch web (same method as Glance)
-        client_id = 'kimne78kx3ncx6brgo4mv6wki5h1ko'
-
-        query = """
-        query GetStreamInfo($login: String!) {
-            user(login: $login) {
-                displayName
-                login
-                stream {
-                    title
-                    viewersCount
-                    game {
-                        name
-                    }
-                }
-            }
-        }
-        """
 
-        headers = {
-            'Client-ID': client_id,
-            'Content-Type': 'application/json',
-        }
+def precompress_assets(directories=ASSET_DIRS):
+    """Write .gz (and .br, if brotli is installed) variants of static assets
 
-        payload = {
-            'query': query,
-            'variables': {'login': channel_name.lower()}
-        }
+    Only compressible files of at least COMPRESS_MIN_BYTES are compressed,
+    and variants already newer than their original are left alone.
 
-        response = requests.post(
-            'https://gql.twitch.tv/gql',
-            headers=headers,
-            json=payload,
-            timeout=5
-        )
-        response.raise_for_status()
-        data = response.json()
+    Returns:
+        Number of variant files written
+    """
+    encodings = ['gzip'] + (['br'] if _brotli() is not None else [])
+    base = os.path.dirname(os.path.abspath(__file__))
+    written = 0
+    for directory in directories:
+        for root_dir, _, files in os.walk(os.path.join(base, directory)):
+            for name in files:
+                path = os.path.join(root_dir, name)
+                if (mimetypes.guess_type(path)[0] not in COMPRESSIBLE_MIMETYPES
+                        or os.path.getsize(path) < COMPRESS_MIN_BYTES):
+                    continue
+                stale = [encoding for encoding in encodings
+                         if not is_fresh_variant(path, path + ENCODING_SUFFIXES[encoding])]
+                if not stale:
+                    continue
+                with open(path, 'rb') as f:
+                    data = f.read()
+                for encoding in stale:
+                    with open(path + ENCODING_SUFFIXES[encoding], 'wb') as f:
+                        f.write(compress_body(data, encoding, best=True))
+                    written += 1
+    log("Precompressed %s static asset variants", written)
+    return written
+
+
+def render_context(snapshot, now=None, time_labels=True):
+    """Build the index.html context for a snapshot
+
+    Relative timestamps are computed here, in one pass over the items that
+    will actually be rendered, so cached items never carry stale labels.
+    With time_labels=False items keep only published_ts, which the page
+    labels in the browser (used by static builds, which are served for
+    hours). Works with both built and lazy (streaming) snapshots.
+    """
+    now = time.time() if now is None else now
+
+    def label(items):
+        return add_time_labels(items, now) if time_labels else items
+
+    def feed_view(feed):
+        # all_items is only served through the feed API, not rendered
+        view = {key: value for key, value in feed.items() if key != 'all_items'}
+        view['items'] = label(feed['items'])
+        return view
+
+    def youtube_view(channel):
+        return dict(channel, videos=label(channel['videos']))
+
+    def apply(fn, values):
+        if isinstance(values, ResolvingList):
+            return values.mapped(fn)
+        return [fn(value) for value in values]
+
+    return {
+        'sections': [
+            {'title': section['title'], 'feeds': apply(feed_view, section['feeds'])}
+            for section in snapshot['sections']
+        ],
+        'reddit_data': snapshot['reddit_data'],
+        'youtube_data': apply(youtube_view, snapshot['youtube_data']),
+        'twitch_data': snapshot['twitch_data']
+    }
 
-        log(f"Twitch fetch successful: {channel_name}")
 
-        user_data = data.get('data', {}).get('user')
-        if not user_data:
-            log(f"Twitch user not found: {channel_name}")
-            return {
-                'name': channel_name,
-                'display_name': channel_name,
-                'is_live': False,
-                'game': '',
-                'viewers': 0,
-                'title': ''
-            }
+def stream_snapshot_page():
+    """Stream the page while its fetches complete, then publish it as the snapshot
 
-        stream = user_data.get('stream')
-        if stream:
-            game = stream.get('game', {}) or {}
-            return {
-                'name': user_data.get('login', channel_name),
-                'display_name': user_data.get('displayName', channel_name),
-                'is_live': True,
-                'game': game.get('name', ''),
-                'viewers': stream.get('viewersCount', 0),
-                'title': stream.get('title', '')[:100]
-            }
-        return {
-            'name': user_data.get('login', channel_name),
-            'display_name': user_data.get('displayName', channel_name),
-            'is_live': False,
-            'game': '',
-            'viewers': 0,
-            'title': ''
-        }
+    The shell is sent immediately and each widget is flushed as soon as its
+    fetch (and every fetch before it in page order) has completed. Must be
+    called by the leader of the snapshot flight, which is resolved with the
+    published snapshot when the stream ends.
+    """
+    try:
+        lazy = start_snapshot_build()
+        # Created inside the request so it keeps the request context while streaming
+        chunks = stream_template('index.html', **render_context(lazy, label_time()))
     except Exception as e:
-        log(f"ERROR fetching Twitch {channel_name}: {e}")
-        log(traceback.format_exc())
-        return {
-            'name': channel_name,
-            'display_name': channel_name,
-            'is_live': False,
-            'game': '',
-            'viewers': 0,
-            'title': '',
-            'error': True
-        }
+        SNAPSHOT_FLIGHT.resolve('snapshot', error=e)
+        raise
 
+    published = []
 
-@app.after_request
-def add_header(response):
-    response.headers["Cache-Control"] = "public, max-age=300"
+    def publish():
+        global SNAPSHOT
+        if published:
+            return
+        published.append(True)
+        try:
+            SNAPSHOT = materialize_snapshot(lazy)
+        except Exception as e:
+            log("Error publishing streamed snapshot: %s", e, level=logging.ERROR)
+            SNAPSHOT_FLIGHT.resolve('snapshot', error=e)
+        else:
+            SNAPSHOT_FLIGHT.resolve('snapshot', SNAPSHOT)
+
+    def generate():
+        try:
+            yield from chunks
+        except Exception as e:
+            log("Error while streaming root page: %s", e, level=logging.ERROR, exc_info=True)
+        finally:
+            publish()
+
+    response = app.response_class(generate(), mimetype='text/html')
+    # Also publish if the client goes away before the stream is started
+    response.call_on_close(publish)
     return response
 
 
-@app.route('/')
-def root():
-    try:
-        log("=== Starting request to root route ===")
+_template_version = None
 
-        # Load configuration
-        config = load_feeds_config()
-        log(f"Config loaded. Sections: {len(config.get('sections', []))}")
-
-        sections = config.get('sections', [])
-        log(f"Processing {len(sections)} sections")
-
-        # Collect all feeds with section and index info for parallel fetching
-        all_feeds = []
-        for section_idx, section in enumerate(sections):
-            feeds = section.get('feeds', [])
-            for feed_idx, feed in enumerate(feeds):
-                # Initialize feed data structure
-                feed['items'] = []
-                feed['all_items'] = []
-                feed['error'] = False
-                feed['error_msg'] = ''
-                feed['initial_limit'] = feed.get('limit', 3)
-                all_feeds.append({
-                    'section_idx': section_idx,
-                    'feed_idx': feed_idx,
-                    'feed': feed
-                })
-
-        log(f"Total feeds to fetch: {len(all_feeds)}")
-
-        # Fetch all RSS feeds in parallel
-        with ThreadPoolExecutor(max_workers=RSS_MAX_WORKERS) as executor:
-            future_to_feed = {
-                executor.submit(
-                    fetch_rss_feed,
-                    f['feed']['url'],
-                    f['feed'].get('limit', 3),
-                    True  # fetch_all=True for load-more support
-                ): f for f in all_feeds
-            }
 
-            try:
-                for future in as_completed(future_to_feed, timeout=PARALLEL_TIMEOUT):
-                    feed_info = future_to_feed[future]
-                    try:
-                        result = future.result()
-                        feed_data = sections[feed_info['section_idx']
-                                             ]['feeds'][feed_info['feed_idx']]
-                        feed_data['all_items'] = result['items']
-                        feed_data['items'] = result['items'][:feed_data['initial_limit']]
-                        feed_data['error'] = result['error']
-                        feed_data['error_msg'] = result['error_msg']
-                        feed_data['total_count'] = result['total_count']
-                    except Exception as e:
-                        log(f"Error fetching {feed_info['feed']['url']}: {e}")
-                        feed_data = sections[feed_info['section_idx']
-                                             ]['feeds'][feed_info['feed_idx']]
-                        feed_data['items'] = []
-                        feed_data['all_items'] = []
-                        feed_data['error'] = True
-                        feed_data['error_msg'] = str(e)
-            except TimeoutError:
-                log(
-                    f"RSS fetching timed out after {PARALLEL_TIMEOUT} seconds. Some feeds may not be loaded.")
-                # Cancel pending futures and ensure data is set for timed-out feeds
-                for future, feed_info in future_to_feed.items():
-                    future.cancel()
-                    # Ensure data is set even for timed-out feeds
-                    feed_data = sections[feed_info['section_idx']
-                                         ]['feeds'][feed_info['feed_idx']]
-                    if 'items' not in feed_data:
-                        feed_data['items'] = []
-                        feed_data['all_items'] = []
-                        feed_data['error'] = True
-                        feed_data['error_msg'] = 'Timeout'
-
-        log(f"Processed {len(all_feeds)} feeds total")
-
-        # Fetch all subreddits in parallel
-        reddit_data = []
-        subreddits = config.get('subreddits', [])
-        log(f"Processing {len(subreddits)} subreddits")
-
-        with ThreadPoolExecutor(max_workers=REDDIT_MAX_WORKERS) as executor:
-            future_to_subreddit = {
-                executor.submit(fetch_reddit, sub, 5): sub
-                for sub in subreddits
-            }
+def template_version():
+    """Hash of the page templates, so a deploy changes every page ETag"""
+    global _template_version
+    if _template_version is None:
+        folder = os.path.join(app.root_path, app.template_folder)
+        digest = hashlib.blake2b(digest_size=8)
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), 'rb') as f:
+                digest.update(f.read())
+        _template_version = digest.hexdigest()
+    return _template_version
 
-            try:
-                for future in as_completed(future_to_subreddit, timeout=PARALLEL_TIMEOUT):
-                    subreddit = future_to_subreddit[future]
-                    try:
-                        posts = future.result()
-                        if posts:
-                            reddit_data.append({
-                                'name': f'r/{subreddit}',
-                                'posts': posts
-                            })
-                    except Exception as e:
-                        log(f"Error fetching r/{subreddit}: {e}")
-            except TimeoutError:
-                log(
-                    f"Reddit fetching timed out after {PARALLEL_TIMEOUT} seconds")
-                # Cancel pending futures to prevent resource leaks
-                for future in future_to_subreddit:
-                    future.cancel()
-
-        log(f"Fetched data from {len(reddit_data)} subreddits")
-
-        # Fetch all YouTube channels in parallel
-        youtube_data = []
-        youtube_channels = config.get('youtube_channels', [])
-        log(f"Processing {len(youtube_channels)} YouTube channels")
-
-        with ThreadPoolExecutor(max_workers=YOUTUBE_MAX_WORKERS) as executor:
-            future_to_channel = {
-                executor.submit(
-                    fetch_youtube,
-                    channel.get('channel_id'),
-                    channel.get('name'),
-                    channel.get('limit', 3)
-                ): channel for channel in youtube_channels
-            }
 
+def page_etag(snapshot, now):
+    """Strong ETag of the page rendered from a snapshot at time now"""
+    return f"{snapshot['version']}-{template_version()}-{int(now // 60):x}"
+
+
+def _snapshot_items(snapshot):
+    """Every item, post and video dict in a snapshot"""
+    for section in snapshot['sections']:
+        for feed in section['feeds']:
+            yield from feed.get('all_items', [])
+            yield from feed.get('items', [])
+    for block in snapshot['reddit_data']:
+        if block:
+            yield from block.get('posts', [])
+    for channel in snapshot['youtube_data']:
+        yield from channel.get('videos', [])
+
+
+def thumbnail_source(thumbnail):
+    """The upstream image URL of a /thumb URL, or None for any other thumbnail"""
+    from urllib.parse import parse_qs
+
+    if not (thumbnail or '').startswith('/thumb?'):
+        return None
+    return parse_qs(thumbnail[len('/thumb?'):]).get('url', [''])[0] or None
+
+
+def bake_thumbnails(snapshot, files):
+    """Point a snapshot's proxied thumbnails at files under thumbs/
+
+    Each /thumb URL is resized once (through THUMB_CACHE, so later builds
+    reuse it) and added to files. Thumbnails that cannot be made fall back
+    to the original image URL. The snapshot is modified in place.
+    """
+    originals = {}
+    for item in _snapshot_items(snapshot):
+        source = thumbnail_source(item.get('thumbnail'))
+        if source:
+            originals[item['thumbnail']] = source
+
+    def bake(proxied):
+        url = originals[proxied]
+        try:
+            data, content_type, _ = make_thumbnail(url)
+        except Exception as e:
+            log("Keeping original thumbnail %s: %s", url, e, level=logging.WARNING)
+            return proxied, url, None
+        name = hashlib.blake2b(url.encode(), digest_size=12).hexdigest()
+        return proxied, f"thumbs/{name}{mimetypes.guess_extension(content_type) or ''}", data
+
+    baked = {}
+    for proxied, path, data in FETCH_EXECUTOR.map(bake, list(originals)):
+        baked[proxied] = path
+        if data is not None:
+            files[path] = data
+    for item in _snapshot_items(snapshot):
+        if item.get('thumbnail') in baked:
+            item['thumbnail'] = baked[item['thumbnail']]
+
+
+def write_build_files(out_dir, files, previous_hashes):
+    """Write the files whose content changed since the last build
+
+    Compressible files also get .gz/.br variants. Files from the previous
+    build that are no longer produced are deleted.
+
+    Returns:
+        (hashes of every file, number of files written)
+    """
+    hashes = {}
+    written = 0
+    for path, data in files.items():
+        if isinstance(data, str):
+            data = data.encode()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        hashes[path] = digest
+        full_path = os.path.join(out_dir, path)
+        if previous_hashes.get(path) == digest and os.path.isfile(full_path):
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        variants = {full_path: data}
+        if (mimetypes.guess_type(path)[0] in COMPRESSIBLE_MIMETYPES
+                and len(data) >= COMPRESS_MIN_BYTES):
+            for encoding in ['gzip'] + (['br'] if _brotli() is not None else []):
+                variants[full_path + ENCODING_SUFFIXES[encoding]] = compress_body(
+                    data, encoding, best=True)
+        for variant, content in variants.items():
+            with open(variant, 'wb') as f:
+                f.write(content)
+        written += 1
+    for path in set(previous_hashes) - set(hashes):
+        for suffix in ('', '.gz', '.br'):
             try:
-                for future in as_completed(future_to_channel, timeout=PARALLEL_TIMEOUT):
-                    channel = future_to_channel[future]
-                    try:
-                        videos = future.result()
-                        youtube_data.append({
-                            'name': channel.get('name'),
-                            'category': channel.get('category', 'General'),
-                            'videos': videos,
-                            'error': len(videos) == 0
-                        })
-                    except Exception as e:
-                        log(f"Error fetching YouTube {channel.get('name')}: {e}")
-                        youtube_data.append({
-                            'name': channel.get('name'),
-                            'category': channel.get('category', 'General'),
-                            'videos': [],
-                            'error': True
-                        })
-            except TimeoutError:
-                log(
-                    f"YouTube fetching timed out after {PARALLEL_TIMEOUT} seconds")
-                # Cancel pending futures to prevent resource leaks
-                for future in future_to_channel:
-                    future.cancel()
-
-        log(f"Fetched data from {len(youtube_data)} YouTube channels")
-
-        # Fetch all Twitch channels in parallel
-        twitch_data = []
-        twitch_channels = config.get('twitch_channels', [])
-        log(f"Processing {len(twitch_channels)} Twitch channels")
-
-        with ThreadPoolExecutor(max_workers=TWITCH_MAX_WORKERS) as executor:
-            future_to_channel = {
-                executor.submit(fetch_twitch_status, channel): channel
-                for channel in twitch_channels
-            }
+                os.remove(os.path.join(out_dir, path + suffix))
+            except FileNotFoundError:
+                pass
+    return hashes, written
+
+
+def build_static_site(out_dir=None):
+    """Fetch every source once and write a prerendered copy of the dashboard
+
+    Writes index.html, api/feeds.json, one api/feeds/<id>.json per feed with
+    all of its items, baked thumbnails under thumbs/ and snapshot.json (read
+    by adopt_prebuilt_snapshot), so a CDN can serve the page and a cold
+    process can start from the baked data. Rebuilds are incremental: widget
+    blocks whose data is unchanged reuse the HTML recorded in
+    build-manifest.json, and unchanged files are not rewritten.
+
+    Returns:
+        dict with the number of files, files written and blocks rendered/reused
+    """
+    started = time.time()
+    out_dir = out_dir or BUILD_DIR
+    if not out_dir:
+        raise ValueError('No output directory given and BUILD_DIR is empty')
+    manifest_path = os.path.join(out_dir, 'build-manifest.json')
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    for key, html in previous.get('fragments', {}).items():
+        FRAGMENT_CACHE.set(key, html, len(html))
+
+    PARSE_POOL.start()
+    snapshot = build_snapshot()
+    now = snapshot['built_at']
+    files = {'snapshot.json': json.dumps(
+        {key: value for key, value in snapshot.items() if key != 'config'}, sort_keys=True)}
+
+    exported = json.loads(files['snapshot.json'])
+    bake_thumbnails(exported, files)
+    fragment_stats = FRAGMENT_CACHE.stats()
+    with app.test_request_context('/'):
+        g.fragments = {}
+        files['index.html'] = render_template(
+            'index.html', static_export=True,
+            **render_context(exported, now, time_labels=False))
+        fragments = g.fragments
+    rendered = FRAGMENT_CACHE.stats()['misses'] - fragment_stats['misses']
+
+    files['api/feeds.json'] = json.dumps(feeds_payload(exported), sort_keys=True)
+    for section in exported['sections']:
+        for feed in section['feeds']:
+            total = len(feed.get('all_items', []))
+            files[f"api/feeds/{feed['id']}.json"] = json.dumps(
+                feed_items_payload(section['title'], feed, 0, total, now), sort_keys=True)
+
+    hashes, written = write_build_files(out_dir, files, previous.get('files', {}))
+    with open(manifest_path, 'w') as f:
+        json.dump({'built_at': now, 'version': snapshot['version'],
+                   'files': hashes, 'fragments': fragments}, f, sort_keys=True)
+    precompress_assets()
+
+    result = {'files': len(files), 'written': written,
+              'blocks_rendered': rendered, 'blocks_reused': len(fragments) - rendered}
+    log("Built %s in %.1fs: %s of %s files changed, %s of %s blocks re-rendered",
+        out_dir, time.time() - started, written, len(files),
+        rendered, len(fragments))
+    return result
 
+
+@app.route('/')
+def root():
+    try:
+        log("=== Starting request to root route ===", level=logging.DEBUG)
+
+        adopt_prebuilt_snapshot()
+        if SNAPSHOT is None and STREAM_RENDER:
+            future, leader = SNAPSHOT_FLIGHT.claim('snapshot')
+            if leader:
+                log("No snapshot yet, streaming page while fetching", level=logging.DEBUG)
+                start_refresher()
+                return stream_snapshot_page()
+            # Another request is already fetching; render its snapshot once published
             try:
-                for future in as_completed(future_to_channel, timeout=PARALLEL_TIMEOUT):
-                    channel = future_to_channel[future]
-                    try:
-                        status = future.result()
-                        twitch_data.append(status)
-                    except Exception as e:
-                        log(f"Error fetching Twitch {channel}: {e}")
-                        twitch_data.append({
-                            'name': channel,
-                            'display_name': channel,
-                            'is_live': False,
-                            'game': '',
-                            'viewers': 0,
-                            'title': '',
-                            'error': True
-                        })
-            except TimeoutError:
-                log(
-                    f"Twitch fetching timed out after {PARALLEL_TIMEOUT} seconds")
-                # Cancel pending futures to prevent resource leaks
-                for future in future_to_channel:
-                    future.cancel()
-
-        log(f"Fetched status from {len(twitch_data)} Twitch channels")
-
-        # Sort Twitch data: live channels first, then offline
-        twitch_data.sort(key=lambda x: (
-            not x.get('is_live', False), x.get('display_name', '').lower()))
-        log(f"Sorted Twitch data: live channels first")
-
-        log("=== Rendering template ===")
-
-        return render_template(
-            'index.html',
-            config=config,
-            reddit_data=reddit_data,
-            youtube_data=youtube_data,
-            twitch_data=twitch_data
-        )
+                SNAPSHOT_FLIGHT.wait(future)
+            except FuturesTimeoutError:
+                raise
+            except Exception:
+                pass
+
+        snapshot = get_snapshot()
+        # Relative time labels only change by the minute, so the page does too
+        now = label_time()
+
+        etag = page_etag(snapshot, now)
+
+        def render():
+            html = RESPONSE_CACHE.get(etag)
+            if html is None:
+                log("=== Rendering template ===", level=logging.DEBUG)
+                render_started = time.perf_counter()
+                html = render_template('index.html', **render_context(snapshot, now))
+                METRICS.observe('prawnfeeds_render_seconds', time.perf_counter() - render_started)
+                RESPONSE_CACHE.set(etag, html, len(html))
+            return app.response_class(html, mimetype='text/html')
+
+        return conditional_response(etag, render)
 
     except Exception as e:
-        log(f"CRITICAL ERROR in root route: {e}")
-        log(traceback.format_exc())
+        log("Unhandled error in root route: %s", e, level=logging.CRITICAL, exc_info=True)
 
         # Return detailed error page
         error_html = f"""
@@ -780,7 +3542,7 @@ def root():
 
 @app.route('/health')
 def health():
-    log("Health check endpoint called")
+    log("Health check endpoint called", level=logging.DEBUG)
     return jsonify({
         "status": "ok",
         "python_version": sys.version,
@@ -789,6 +3551,209 @@ def health():
     }), 200
 
 
+@app.route('/stats')
+def stats():
+    """Runtime statistics for the fetch pipeline"""
+    return jsonify({
+        "pool": pool_stats(),
+        "cache": FEED_CACHE.stats(),
+        "http_cache": HTTP_CACHE_STATS.snapshot(),
+        "fragments": FRAGMENT_CACHE.stats(),
+        "breakers": FEED_BREAKERS.stats(),
+        "polling": FEED_POLLER.stats(),
+        "items": ITEM_STORE.stats() if ITEM_STORE is not None else None,
+        "thumbnails": THUMB_CACHE.stats() if THUMB_CACHE is not None else None,
+        "parse_pool": PARSE_POOL.stats(),
+        "single_flight": {
+            "snapshot": SNAPSHOT_FLIGHT.stats(),
+            "fetch": FETCH_FLIGHT.stats()
+        }
+    }), 200
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for fetches, snapshot builds and rendering"""
+    return app.response_class(METRICS.render(),
+                              content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/breakers')
+def breakers():
+    """Circuit breaker state for every feed fetched so far"""
+    return jsonify({"feeds": FEED_BREAKERS.snapshot()}), 200
+
+
+@app.route('/thumb')
+def thumb():
+    """Resized, long-cached copy of a feed item's thumbnail image"""
+    url = request.args.get('url', '')
+    if not url:
+        return jsonify({"error": "Missing url parameter"}), 400
+    # Only URLs the fetchers rewrote are served, so this is not an open proxy
+    if not hmac.compare_digest(request.args.get('sig', '').encode(), thumb_signature(url).encode()):
+        return jsonify({"error": "Invalid signature"}), 403
+    if not is_safe_url(url):
+        return jsonify({"error": "Unsafe URL"}), 403
+    try:
+        data, content_type, outcome = make_thumbnail(url)
+    except Exception as e:
+        METRICS.inc('prawnfeeds_thumbnails_total', outcome='error')
+        log("Error making thumbnail for %s: %s", url, e, level=logging.WARNING)
+        response = jsonify({"error": "Image unavailable"})
+        response.status_code = 502
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response
+
+    METRICS.inc('prawnfeeds_thumbnails_total', outcome=outcome)
+    response = app.response_class(data, content_type=content_type)
+    response.headers['Cache-Control'] = f'public, max-age={THUMB_MAX_AGE}, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.set_etag(hashlib.blake2b(data, digest_size=16).hexdigest())
+    return response.make_conditional(request)
+
+
+def json_response(payload):
+    """JSON response with stable key order"""
+    return app.response_class(json.dumps(payload, sort_keys=True), mimetype='application/json')
+
+
+def json_with_etag(payload):
+    """JSON response with a strong ETag of its body, answering 304 when the client has it"""
+    response = json_response(payload)
+    etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+    return conditional_response(etag, lambda: response)
+
+
+def find_feed(snapshot, wanted_id):
+    """Return (section_title, feed) for a feed ID in the snapshot, or (None, None)"""
+    for section in snapshot['sections']:
+        for feed in section['feeds']:
+            if feed['id'] == wanted_id:
+                return section['title'], feed
+    return None, None
+
+
+def feeds_payload(snapshot):
+    """The /api/feeds body: every feed with its ID and item count"""
+    feeds = []
+    for section in snapshot['sections']:
+        for feed in section['feeds']:
+            feeds.append({
+                'id': feed['id'],
+                'name': feed.get('name'),
+                'url': feed.get('url'),
+                'section': section['title'],
+                'initial_limit': feed.get('initial_limit'),
+                'total_count': feed.get('total_count', 0),
+                'error': feed.get('error', False)
+            })
+    return {'feeds': feeds}
+
+
+def feed_items_payload(section_title, feed, offset, limit, now):
+    """The /api/feeds/<id> body: one page of a feed's items labelled at now"""
+    all_items = feed.get('all_items', [])
+    return {
+        'id': feed['id'],
+        'name': feed.get('name'),
+        'section': section_title,
+        'offset': offset,
+        'limit': limit,
+        'total_count': len(all_items),
+        'items': add_time_labels(all_items[offset:offset + limit], now),
+        'error': feed.get('error', False)
+    }
+
+
+@app.route('/api/feeds')
+def api_feeds():
+    """List every feed with its ID and item count"""
+    snapshot = get_snapshot()
+    return conditional_response(snapshot['version'],
+                                lambda: json_response(feeds_payload(snapshot)))
+
+
+@app.route('/api/feeds/<feed_id>')
+def api_feed_items(feed_id):
+    """Page through a feed's normalized items
+
+    Query args:
+        offset: Index of the first item to return (default 0)
+        limit: Number of items to return (default 10, at most MAX_FETCH_ITEMS)
+    """
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 10, type=int), 0), MAX_FETCH_ITEMS)
+
+    snapshot = get_snapshot()
+    section_title, feed = find_feed(snapshot, feed_id)
+    if feed is None:
+        return jsonify({"status": "error", "error": "Unknown feed"}), 404
+
+    now = label_time()
+    return conditional_response(
+        f"{snapshot['version']}-{int(now // 60):x}",
+        lambda: json_response(feed_items_payload(section_title, feed, offset, limit, now)))
+
+
+def item_query_limit():
+    """The request's limit argument, defaulting to 20 and capped at ITEM_QUERY_MAX_LIMIT"""
+    return min(max(request.args.get('limit', 20, type=int), 1), ITEM_QUERY_MAX_LIMIT)
+
+
+@app.route('/search')
+def search_items():
+    """Full-text search over every item stored so far
+
+    Query args:
+        q: Words to search item titles and feed names for (prefix matches)
+        offset: Number of results to skip (default 0)
+        limit: Number of results to return (default 20, at most ITEM_QUERY_MAX_LIMIT)
+    """
+    if ITEM_STORE is None:
+        return jsonify({"status": "error", "error": "Item store disabled"}), 503
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"status": "error", "error": "Missing q"}), 400
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = item_query_limit()
+
+    items = ITEM_STORE.search(query, limit, offset)
+    return json_with_etag({
+        'query': query,
+        'offset': offset,
+        'limit': limit,
+        'items': add_time_labels(items, time.time())
+    })
+
+
+@app.route('/api/timeline')
+def api_timeline():
+    """Latest items across all feeds, newest first
+
+    Query args:
+        before: Cursor of the last item already seen, from a previous page's 'next'
+        limit: Number of items to return (default 20, at most ITEM_QUERY_MAX_LIMIT)
+    """
+    if ITEM_STORE is None:
+        return jsonify({"status": "error", "error": "Item store disabled"}), 503
+    before = request.args.get('before')
+    if before:
+        try:
+            sort_ts, item_id = before.split(':')
+            before = (int(sort_ts), int(item_id))
+        except ValueError:
+            return jsonify({"status": "error", "error": "Invalid cursor"}), 400
+    limit = item_query_limit()
+
+    items = ITEM_STORE.timeline(limit, before or None)
+    return json_with_etag({
+        'limit': limit,
+        'items': add_time_labels(items, time.time()),
+        'next': items[-1]['cursor'] if len(items) == limit else None
+    })
+
+
 @app.route('/debug')
 def debug():
     """Debug endpoint to check configuration"""
@@ -797,9 +3762,10 @@ def debug():
         return jsonify({
             "status": "ok",
             "config_loaded": True,
-            "sections_count": len(config.get('sections', [])),
-            "subreddits_count": len(config.get('subreddits', [])),
-            "config": config
+            "snapshot_built_at": SNAPSHOT['built_at'] if SNAPSHOT else None,
+            "sections_count": len(config.sections),
+            "subreddits_count": len(config.subreddits),
+            "config": config.to_dict()
         }), 200
     except Exception as e:
         return jsonify({
@@ -813,6 +3779,14 @@ def debug():
 app = app
 
 if __name__ == '__main__':
+    if sys.argv[1:] == ['precompress']:
+        precompress_assets()
+        sys.exit(0)
+    if sys.argv[1:2] == ['build']:
+        # python main.py build [output directory]
+        build_static_site(sys.argv[2] if len(sys.argv) > 2 else None)
+        sys.exit(0)
+
     # Only run in debug mode if explicitly set in environment
     debug_mode = os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
     app.run(host='0.0.0.0', port=5000, debug=debug_mode)
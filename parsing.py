@@ -0,0 +1,352 @@
+"""Feed body parsing and normalization
+
+Everything here is importable without side effects: no databases, threads
+or Flask app. Parse worker processes import only this module, so the
+functions handed to ParsePool must live here.
+"""
+from urllib.parse import urlencode
+import calendar
+import hashlib
+import hmac
+import logging
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+
+# Set THUMB_PROXY=false to link feed thumbnails directly instead of through /thumb
+THUMB_PROXY = os.environ.get('THUMB_PROXY', 'true').lower() == 'true'
+
+# /thumb only serves URLs signed with this key. Set THUMB_SECRET to share one
+# key across instances; otherwise a random key is kept in THUMB_KEY_PATH
+THUMB_SECRET = os.environ.get('THUMB_SECRET', '')
+THUMB_KEY_PATH = os.environ.get(
+    'THUMB_KEY_PATH', os.path.join(tempfile.gettempdir(), 'prawnfeeds-thumb.key'))
+
+logger = logging.getLogger('prawnfeeds')
+
+# Phase timings of the fetch running on the current thread
+_fetch_timing = threading.local()
+
+
+def start_fetch_timing():
+    """Begin collecting phase timings for a fetch on this thread"""
+    _fetch_timing.phases = {}
+    return _fetch_timing.phases
+
+
+def record_phase(phase, seconds):
+    """Add time to a phase of the current thread's fetch, if one is being timed"""
+    phases = getattr(_fetch_timing, 'phases', None)
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+def stop_fetch_timing():
+    """Stop timing the current thread's fetch and return its phase timings"""
+    phases = getattr(_fetch_timing, 'phases', None) or {}
+    _fetch_timing.phases = None
+    return phases
+
+
+def timed_parse(parse, body):
+    """Run parse(body), recording the parse phase of the current fetch
+
+    Parsers report their own normalize phase; the rest is parsing.
+    """
+    phases = getattr(_fetch_timing, 'phases', None) or {}
+    normalize_before = phases.get('normalize', 0.0)
+    started = time.perf_counter()
+    data = parse(body)
+    record_phase('parse', time.perf_counter() - started
+                 - (phases.get('normalize', 0.0) - normalize_before))
+    return data
+
+
+def init_parse_worker():
+    """Import the parsing libraries up front in a parse worker process"""
+    import feedparser  # noqa: F401
+    from dateutil import parser  # noqa: F401
+
+
+def parse_job(parse, body):
+    """Parse one body in a worker process, returning (data, phase timings)"""
+    phases = start_fetch_timing()
+    return timed_parse(parse, body), phases
+
+
+def parse_timestamp(value):
+    """Parse a feed date string into UTC epoch seconds, or None
+
+    Tries the stdlib RFC 822 and ISO 8601 parsers first and only falls back
+    to dateutil for unusual formats. Naive dates are assumed to be UTC.
+    """
+    if not value:
+        return None
+    from datetime import datetime, timezone
+    from email.utils import parsedate_to_datetime
+
+    dt = None
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.fromisoformat(value.strip())
+        except ValueError:
+            try:
+                from dateutil import parser as date_parser
+                dt = date_parser.parse(value)
+            except (ValueError, OverflowError) as e:
+                logger.debug("Error parsing date %r: %s", value, e)
+                return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    try:
+        return int(dt.timestamp())
+    except (ValueError, OverflowError) as e:
+        logger.debug("Date out of range %r: %s", value, e)
+        return None
+
+
+def entry_timestamp(entry):
+    """Return a feed entry's publish (or update) time as UTC epoch seconds
+
+    Uses feedparser's pre-parsed UTC struct_time when available so most
+    entries never touch a date string parser. Returns None for dates that
+    cannot be represented, so one bad entry does not fail its whole feed.
+    """
+    for key in ('published_parsed', 'updated_parsed'):
+        parsed = entry.get(key)
+        if parsed:
+            try:
+                return calendar.timegm(parsed)
+            except (ValueError, OverflowError) as e:
+                logger.debug("Date out of range %r: %s", parsed, e)
+                return None
+    return parse_timestamp(entry.get('published', entry.get('updated', '')))
+
+
+_thumb_key = None
+
+
+def thumb_key():
+    """Key signing /thumb URLs: THUMB_SECRET, or a random key kept in THUMB_KEY_PATH
+
+    The key is shared through the file so that every process, and every
+    restart, accepts the URLs in already cached parse results.
+    """
+    global _thumb_key
+    if _thumb_key is not None:
+        return _thumb_key
+    if THUMB_SECRET:
+        _thumb_key = THUMB_SECRET.encode()
+        return _thumb_key
+    try:
+        try:
+            fd = os.open(THUMB_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(THUMB_KEY_PATH, 'rb') as f:
+                key = f.read().strip()
+            if len(key) < 32:
+                raise OSError(f"{THUMB_KEY_PATH} is too short to be a key")
+        else:
+            key = secrets.token_hex(32).encode()
+            with os.fdopen(fd, 'wb') as f:
+                f.write(key)
+    except OSError as e:
+        logger.warning("Thumbnail key unavailable at %s, using a per-process key: %s",
+                       THUMB_KEY_PATH, e)
+        key = secrets.token_hex(32).encode()
+    _thumb_key = key
+    return _thumb_key
+
+
+def thumb_signature(url):
+    """Signature proving a /thumb URL was produced by proxied_thumbnail()"""
+    return hmac.new(thumb_key(), url.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def proxied_thumbnail(url):
+    """Rewrite an upstream image URL to go through the /thumb proxy"""
+    if not THUMB_PROXY or not url.startswith(('http://', 'https://')):
+        return url
+    return '/thumb?' + urlencode({'url': url, 'sig': thumb_signature(url)})
+
+
+def parse_rss_body(content, max_items):
+    """Parse an RSS/Atom document into the normalized feed result
+
+    Args:
+        content: Raw feed bytes
+        max_items: Maximum number of entries to normalize
+
+    Returns:
+        dict with 'items', 'error' flag, 'error_msg', 'total_count' and 'site_url'
+    """
+    import feedparser
+
+    feed = feedparser.parse(content)
+    normalize_started = time.perf_counter()
+    logger.debug("Parsed %s entries", len(feed.entries))
+
+    items = []
+    for entry in feed.entries[:max_items]:
+
+        # Extract thumbnail from various sources
+        thumbnail = ''
+
+        # Try media:thumbnail
+        if hasattr(entry, 'media_thumbnail') and entry.media_thumbnail and len(entry.media_thumbnail) > 0:
+            thumbnail = entry.media_thumbnail[0].get('url', '')
+
+        # Try media:content
+        elif hasattr(entry, 'media_content') and entry.media_content and len(entry.media_content) > 0:
+            media = entry.media_content[0]
+            # Check if it's an image
+            if media.get('medium') == 'image' or 'image' in media.get('type', ''):
+                thumbnail = media.get('url', '')
+
+        # Try enclosures (common in podcasts and some feeds)
+        if not thumbnail and hasattr(entry, 'enclosures') and entry.enclosures:
+            for enclosure in entry.enclosures:
+                if enclosure.get('type', '').startswith('image/'):
+                    thumbnail = enclosure.get('href', '')
+                    break
+
+        items.append({
+            'title': entry.get('title', 'No title')[:150],
+            'link': entry.get('link', '#'),
+            'guid': entry.get('id', ''),
+            'published_ts': entry_timestamp(entry),
+            'thumbnail': proxied_thumbnail(thumbnail)
+        })
+
+    site_url = ''
+    if hasattr(feed, 'feed') and hasattr(feed.feed, 'link'):
+        site_url = feed.feed.link
+
+    record_phase('normalize', time.perf_counter() - normalize_started)
+    return {
+        'items': items,
+        'error': False,
+        'error_msg': '',
+        'total_count': len(items),
+        'site_url': site_url
+    }
+
+
+def _reddit_post(p):
+    """Normalize one Reddit listing child into a post dict"""
+    # Extract thumbnail
+    thumbnail = ''
+    if p.get('thumbnail') and p.get('thumbnail') not in ['self', 'default', 'nsfw', 'spoiler']:
+        thumbnail = p.get('thumbnail')
+    elif p.get('preview') and p.get('preview', {}).get('images'):
+        # Get the first preview image
+        images = p['preview']['images']
+        if images and len(images) > 0:
+            image = images[0]
+            if 'source' in image:
+                thumbnail = image['source'].get(
+                    'url', '').replace('&amp;', '&')
+
+    return {
+        'title': p.get('title', '')[:150],
+        'link': f"https://reddit.com{p.get('permalink', '')}",
+        'guid': p.get('name', ''),
+        'published_ts': int(p['created_utc']) if p.get('created_utc') else None,
+        'score': p.get('score', 0),
+        'comments': p.get('num_comments', 0),
+        'thumbnail': proxied_thumbnail(thumbnail)
+    }
+
+
+def parse_reddit_listing(data, subreddits, limit):
+    """Split a combined multi-subreddit listing into per-subreddit post lists
+
+    Returns:
+        Dict of lowercased subreddit name to at most limit post dicts, in
+        listing order
+    """
+    normalize_started = time.perf_counter()
+    posts = {subreddit.lower(): [] for subreddit in subreddits}
+    for post in data['data']['children']:
+        p = post['data']
+        bucket = posts.get(p.get('subreddit', '').lower())
+        if bucket is not None and len(bucket) < limit:
+            bucket.append(_reddit_post(p))
+    record_phase('normalize', time.perf_counter() - normalize_started)
+    return posts
+
+
+def parse_reddit_rss_body(content, limit):
+    """Normalize a subreddit RSS feed into post dicts"""
+    import feedparser
+
+    feed = feedparser.parse(content)
+    normalize_started = time.perf_counter()
+    logger.debug("Reddit RSS parsed %s entries", len(feed.entries))
+
+    posts = []
+    for entry in feed.entries[:limit]:
+        # Try to extract thumbnail from media elements
+        thumbnail = ''
+        if hasattr(entry, 'media_thumbnail') and entry.media_thumbnail and len(entry.media_thumbnail) > 0:
+            thumbnail = entry.media_thumbnail[0].get('url', '')
+        elif hasattr(entry, 'media_content') and entry.media_content and len(entry.media_content) > 0:
+            media = entry.media_content[0]
+            if media.get('medium') == 'image' or 'image' in media.get('type', ''):
+                thumbnail = media.get('url', '')
+
+        posts.append({
+            'title': entry.get('title', 'No title')[:150],
+            'link': entry.get('link', '#'),
+            'guid': entry.get('id', ''),
+            'published_ts': entry_timestamp(entry),
+            'score': 0,  # RSS doesn't provide score
+            'comments': 0,  # RSS doesn't provide comment count
+            'thumbnail': proxied_thumbnail(thumbnail)
+        })
+    record_phase('normalize', time.perf_counter() - normalize_started)
+    return posts
+
+
+def parse_youtube_body(content, limit):
+    """Parse a YouTube channel feed into video dicts"""
+    import feedparser
+
+    feed = feedparser.parse(content)
+    normalize_started = time.perf_counter()
+    logger.debug("Parsed %s entries from YouTube feed", len(feed.entries))
+
+    videos = []
+    for entry in feed.entries[:limit]:
+
+        # Extract thumbnail from media:thumbnail or construct from video ID
+        thumbnail = ''
+        if hasattr(entry, 'media_thumbnail') and entry.media_thumbnail and len(entry.media_thumbnail) > 0:
+            thumbnail = entry.media_thumbnail[0].get('url', '')
+        elif hasattr(entry, 'media_content') and entry.media_content and len(entry.media_content) > 0:
+            thumbnail = entry.media_content[0].get('url', '')
+
+        # If no thumbnail found, try to extract video ID from link and construct thumbnail URL
+        if not thumbnail:
+            video_link = entry.get('link', '')
+            video_id_match = re.search(
+                r'(?:v=|/videos/|/embed/|youtu\.be/)([a-zA-Z0-9_-]{11})', video_link)
+            if video_id_match:
+                video_id = video_id_match.group(1)
+                thumbnail = f'https://img.youtube.com/vi/{video_id}/mqdefault.jpg'
+                logger.debug("Constructed thumbnail URL from video ID: %s", video_id)
+
+        videos.append({
+            'title': entry.get('title', 'No title')[:150],
+            'link': entry.get('link', '#'),
+            'guid': entry.get('id', ''),
+            'published_ts': entry_timestamp(entry),
+            'thumbnail': thumbnail
+        })
+    record_phase('normalize', time.perf_counter() - normalize_started)
+    return videos